@@ -0,0 +1,62 @@
+"""Helpers shared by benchmark scripts."""
+# from __future__ import annotations
+
+import time
+from typing import Any, Callable, cast  # pylint: disable=unused-import
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+def measure(func, repeat, number=1):
+    # type: (Callable[[], Any], int, int) -> float
+    """Return the best time of one call of `func`.
+
+    The time is measured `repeat` times, each time `func` is called
+    `number` times in a row.
+    """
+    best = None  # type: None | float
+    for _ in range(repeat):
+        started = timer()
+        for _ in range(number):
+            func()
+        elapsed = (timer() - started) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return cast(float, best)
+
+
+def autorange(func, min_time=0.05):
+    # type: (Callable[[], Any], float) -> int
+    """Return number of calls of `func` which take at least `min_time` seconds."""
+    number = 1
+    while True:
+        started = timer()
+        for _ in range(number):
+            func()
+        if timer() - started >= min_time:
+            return number
+        number *= 2
+
+
+def compare(cases, repeat):
+    # type: (list[tuple[str, Callable[[], Any], Callable[[], Any]]], int) -> None
+    """Print timings of old and new implementations.
+
+    Each case is (name, old function, new function) tuple. Both functions
+    must return same result.
+    """
+    width = max(len(x[0]) for x in cases) + 2
+    print(
+        "{:<{}} {:>10} {:>10} {:>8}".format(
+            "case", width, "old, ms", "new, ms", "speedup"
+        )
+    )
+    for name, old_func, new_func in cases:
+        if old_func() != new_func():
+            raise AssertionError("Results are different in case: {}".format(name))
+        old_time = measure(old_func, repeat)
+        new_time = measure(new_func, repeat)
+        print(
+            "{:<{}} {:>10.1f} {:>10.1f} {:>8.2f}".format(
+                name, width, old_time * 1000, new_time * 1000, old_time / new_time
+            )
+        )
@@ -0,0 +1,106 @@
+# coding: utf-8
+"""Generated documents used by the benchmark suite.
+
+All documents are built from fixed templates, so the same size always
+produces the same bytes and timings of different runs are comparable.
+"""
+# from __future__ import annotations
+
+from typing import Callable  # pylint: disable=unused-import
+
+SIZES = {
+    "small": 20,
+    "medium": 200,
+    "large": 2000,
+}
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua. "
+)
+
+
+def make_listing(items):
+    # type: (int) -> bytes
+    """Return product listing page similar to pages of online shops.
+
+    The page has head with scripts and styles, navigation, product cards
+    with prices, attributes, HTML entities and nested markup, and a footer.
+    """
+    head = (
+        "<head><meta charset='utf-8'><title>Catalog &mdash; Shop</title>"
+        "<link rel='stylesheet' href='/static/main.css'>"
+        "<style>.item {{ margin: 0 }} .price {{ color: red }}</style>"
+        "<script>window.dataLayer = [{{'page': 'catalog', 'items': {}}}];</script>"
+        "</head>".format(items)
+    )
+    nav = "".join(
+        "<li><a href='/category/{0}' class='nav-link'>Category {0}</a></li>".format(x)
+        for x in range(20)
+    )
+    cards = "".join(
+        "<div class='item product' id='item-{0}' data-sku='SKU{0:06d}'>\n"
+        "  <h2 class='title'><a href='/item/{0}' title='Item {0}'>Item&nbsp;{0}"
+        " <b>&laquo;name&raquo;</b></a></h2>\n"
+        "  <img src='/img/{0}.jpg' alt='Item {0}'>\n"
+        "  <div class='price'>Price: {1} USD <span class='old'>{2}&nbsp;USD</span>"
+        "</div>\n"
+        "  <table class='specs'><tr><th>Weight</th><td>{3} g</td></tr>"
+        "<tr><th>Color</th><td>red &amp; blue</td></tr></table>\n"
+        "  <p class='description'>{4}<!-- comment {0} --></p>\n"
+        "</div>\n".format(x, 100 + x, 150 + x, 10 * x, LOREM)
+        for x in range(items)
+    )
+    return (
+        "<!DOCTYPE html><html lang='en'>{}<body>"
+        "<div id='header'><ul class='nav'>{}</ul></div>"
+        "<div id='content'><h1>Catalog</h1>{}</div>"
+        "<div id='footer'>&copy; Shop &#8212; all rights reserved</div>"
+        "</body></html>".format(head, nav, cards)
+    ).encode("utf-8")
+
+
+def make_nested(items):
+    # type: (int) -> bytes
+    """Return document with deeply nested blocks of text and inline tags."""
+    depth = 30
+    block = (
+        "<div class='level'>" * depth
+        + "<p>text <i>italic</i> <b>bold</b>\n\t tail</p>"
+        + "</div>" * depth
+    )
+    return "<html><body>{}</body></html>".format(block * items).encode("utf-8")
+
+
+def make_feed(items):
+    # type: (int) -> bytes
+    """Return RSS feed: XML document with namespaces and CDATA sections."""
+    entries = "".join(
+        "<item><title>News {0}</title><link>https://example.com/news/{0}</link>"
+        "<dc:creator>Author {1}</dc:creator><category>cat{1}</category>"
+        "<description><![CDATA[<p>{2}</p>]]></description>"
+        "<pubDate>Mon, 0{1} Jan 2024 10:00:00 +0000</pubDate></item>".format(
+            x, x % 7 + 1, LOREM
+        )
+        for x in range(items)
+    )
+    return (
+        "<?xml version='1.0' encoding='utf-8'?>"
+        "<rss version='2.0' xmlns:dc='http://purl.org/dc/elements/1.1/'>"
+        "<channel><title>Feed</title>{}</channel></rss>".format(entries)
+    ).encode("utf-8")
+
+
+def make_text(items):
+    # type: (int) -> str
+    """Return text with whitespace runs and named and numeric HTML entities."""
+    return (
+        u"Price:\n\t 10&nbsp;&euro; &mdash; &#8364;20 &#x20AC;30 &amp;  "
+        u"&quot;quoted&quot; &unknown; " + LOREM
+    ) * items
+
+
+CORPORA = {
+    "listing": make_listing,
+    "nested": make_nested,
+    "feed": make_feed,
+}  # type: dict[str, Callable[[int], bytes]]
@@ -0,0 +1,91 @@
+# coding: utf-8
+"""Measure speed of HTML entities decoding on entity-heavy markup.
+
+Compare current single-pass `decode_entities` with the old implementation
+which ran three regular expression substitutions.
+
+Run: PYTHONPATH=. python benchmarks/entities.py [--size 2000] [--repeat 5]
+"""
+# from __future__ import annotations
+
+import argparse
+import re
+from typing import Any, Callable, cast  # pylint: disable=unused-import
+
+import six
+from six.moves.html_entities import name2codepoint
+
+from benchmarks.common import compare
+from selection import XpathSelector
+from selection.util import decode_entities
+
+try:  # noqa: SIM105
+    from re import Match  # pylint: disable=unused-import
+except ImportError:
+    pass
+
+RE_NAMED_ENTITY = re.compile(r"(&[a-z]+;)")
+RE_NUM_ENTITY = re.compile(r"(&#[0-9]+;)")
+RE_HEX_ENTITY = re.compile(r"(&#x[a-f0-9]+;)", re.IGNORECASE)
+
+
+def old_named_entity(match):
+    # type: (Match[str]) -> str
+    name = match.group(1)[1:-1]
+    if name in name2codepoint:
+        return six.unichr(name2codepoint[name])
+    return match.group(1)
+
+
+def old_num_entity(match):
+    # type: (Match[str]) -> str
+    return six.unichr(int(match.group(1)[2:-1]))
+
+
+def old_hex_entity(match):
+    # type: (Match[str]) -> str
+    return six.unichr(int(match.group(1)[3:-1], 16))
+
+
+def old_decode_entities(html):
+    # type: (str) -> str
+    html = RE_NUM_ENTITY.sub(old_num_entity, html)
+    html = RE_HEX_ENTITY.sub(old_hex_entity, html)
+    return RE_NAMED_ENTITY.sub(old_named_entity, html)
+
+
+def make_text(size):
+    # type: (int) -> str
+    return "".join(
+        "&lt;b&gt;Item&nbsp;{0}&lt;/b&gt; &copy; &#{1}; &#x{1:x}; &rarr; "
+        "text without entities ".format(x, 1000 + x)
+        for x in range(size)
+    )
+
+
+def main():
+    # type: () -> None
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    opts = parser.parse_args()
+    text = make_text(opts.size)
+    sel = XpathSelector.from_string("<div>{}</div>".format(text.replace("&", "&amp;")))
+    texts = sel.select("//div/text()").text(normalize_space=False).split("text")
+    cases = [
+        (
+            "one big string",
+            lambda: old_decode_entities(text),
+            lambda: decode_entities(text),
+        ),
+        (
+            "many short strings",
+            lambda: [old_decode_entities(x) for x in texts],
+            lambda: [decode_entities(x) for x in texts],
+        ),
+    ]  # type: list[tuple[str, Callable[[], Any], Callable[[], Any]]]
+    compare(cases, opts.repeat)
+
+
+if __name__ == "__main__":
+    main()
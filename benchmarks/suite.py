@@ -0,0 +1,477 @@
+# coding: utf-8
+"""Benchmark suite of the selection hot paths with saved baselines.
+
+Each benchmark prepares its data once and then the time of one call of
+the measured function is taken as the best of several runs. Results may
+be saved as a baseline and later runs may be compared with it: the run
+fails if any benchmark is slower than the baseline by more than its
+threshold. Benchmarks which look slower are measured once more before
+the run fails, to filter out noise of a busy machine.
+
+Run:
+
+    PYTHONPATH=. python benchmarks/suite.py [--size medium] [--filter text/]
+    PYTHONPATH=. python benchmarks/suite.py --save benchmarks/baseline.json
+    PYTHONPATH=. python benchmarks/suite.py --compare benchmarks/baseline.json
+
+Baselines depend on the machine: save a new one before comparing results
+on other hardware. Benchmarks of optional backends (pyquery, cssselect)
+are skipped if the backend is not installed.
+"""
+# from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+from typing import Any, Callable, cast  # pylint: disable=unused-import
+
+import lxml.etree
+from lxml.etree import XPath
+
+from benchmarks.common import autorange, measure
+from benchmarks.corpora import CORPORA, SIZES, make_text
+from selection import XpathSelector, util
+
+__all__ = ["BENCHMARKS", "compare_results", "run"]
+THRESHOLD = 0.25
+REPEAT = 10
+MIN_TIME = 0.1
+MILLISECOND = 0.001
+CARD_QUERY = "//div[@class='item product']"
+
+
+class Benchmark(object):  # noqa: UP004
+    """Named benchmark.
+
+    :param setup: function which accepts number of items of the corpus and
+        returns the function to measure
+    :param threshold: allowed slowdown relative to the baseline, 0.25 means
+        the benchmark may be 25% slower
+    """
+
+    __slots__ = ("name", "setup", "threshold")
+
+    def __init__(self, name, setup, threshold=THRESHOLD):
+        # type: (str, Callable[[int], Callable[[], Any]], float) -> None
+        self.name = name
+        self.setup = setup
+        self.threshold = threshold
+
+
+BENCHMARKS = []  # type: list[Benchmark]
+DOCUMENTS = {}  # type: dict[tuple[str, int], bytes]
+
+
+def benchmark(name, threshold=THRESHOLD):
+    # type: (str, float) -> Callable[[Callable[[int], Callable[[], Any]]], Any]
+    def decorator(setup):
+        # type: (Callable[[int], Callable[[], Any]]) -> Any
+        BENCHMARKS.append(Benchmark(name, setup, threshold))
+        return setup
+
+    return decorator
+
+
+def load(corpus, items):
+    # type: (str, int) -> bytes
+    key = (corpus, items)
+    if key not in DOCUMENTS:
+        DOCUMENTS[key] = CORPORA[corpus](items)
+    return DOCUMENTS[key]
+
+
+def listing(items, **options):  # noqa: ANN003
+    # type: (int, Any) -> XpathSelector[Any]
+    return XpathSelector.from_bytes(load("listing", items), **options)
+
+
+# Parsing
+
+
+@benchmark("parse/listing")
+def bench_parse_listing(items):
+    # type: (int) -> Callable[[], Any]
+    data = load("listing", items)
+    return lambda: XpathSelector.from_bytes(data)
+
+
+@benchmark("parse/feed-xml")
+def bench_parse_feed(items):
+    # type: (int) -> Callable[[], Any]
+    data = load("feed", items)
+    return lambda: XpathSelector.from_bytes(data, parser="xml")
+
+
+# Select
+
+
+@benchmark("select/descendant")
+def bench_select(items):
+    # type: (int) -> Callable[[], Any]
+    sel = listing(items)
+    return lambda: sel.select(CARD_QUERY)
+
+
+@benchmark("select/first", threshold=0.5)
+def bench_select_first(items):
+    # type: (int) -> Callable[[], Any]
+    sel = listing(items)
+    return lambda: sel.select("//div[@class='price']", first=True)
+
+
+@benchmark("select/lazy-exists", threshold=0.5)
+def bench_select_lazy(items):
+    # type: (int) -> Callable[[], Any]
+    sel = listing(items)
+    return lambda: sel.select("//div[@class='price']", lazy=True).exists()
+
+
+@benchmark("select/indexed")
+def bench_select_indexed(items):
+    # type: (int) -> Callable[[], Any]
+    sel = XpathSelector.from_bytes(
+        load("listing", items), use_index=True
+    )  # type: XpathSelector[Any]
+    sel.select("//a")
+    return lambda: (
+        sel.select("//*[@id='item-1']"),
+        sel.select("//div[contains(@class, 'product')]"),
+    )
+
+
+@benchmark("select/not-indexed")
+def bench_select_not_indexed(items):
+    # type: (int) -> Callable[[], Any]
+    sel = listing(items)
+    return lambda: (
+        sel.select("//*[@id='item-1']"),
+        sel.select("//div[contains(@class, 'product')]"),
+    )
+
+
+@benchmark("select/memoized")
+def bench_select_memoized(items):
+    # type: (int) -> Callable[[], Any]
+    sel = XpathSelector.from_bytes(
+        load("listing", items), memo_size=100
+    )  # type: XpathSelector[Any]
+    return lambda: sel.select("//div[@class='price']")
+
+
+@benchmark("select/chained-dedupe")
+def bench_select_chained(items):
+    # type: (int) -> Callable[[], Any]
+    cards = listing(items).select(CARD_QUERY)
+    return lambda: cards.select("./h2/a", dedupe=True)
+
+
+@benchmark("select/per-node")
+def bench_select_per_node(items):
+    # type: (int) -> Callable[[], Any]
+    cards = listing(items).select(CARD_QUERY).selector_list
+    return lambda: [card.select("./img") for card in cards]
+
+
+@benchmark("select/compiled-xpath")
+def bench_select_xpath(items):
+    # type: (int) -> Callable[[], Any]
+    sel = listing(items)
+    xpath = XPath("//h2/a")
+    return lambda: sel.select_xpath(xpath)
+
+
+@benchmark("select/feed-xml")
+def bench_select_feed(items):
+    # type: (int) -> Callable[[], Any]
+    sel = XpathSelector.from_bytes(
+        load("feed", items), parser="xml"
+    )  # type: XpathSelector[Any]
+    return lambda: sel.select("//item/title").text_list()
+
+
+# Text and attributes
+
+
+@benchmark("text/text", threshold=0.5)
+def bench_text(items):
+    # type: (int) -> Callable[[], Any]
+    sel = listing(items)
+    return lambda: sel.select("//h1").text()
+
+
+@benchmark("text/text_list")
+def bench_text_list(items):
+    # type: (int) -> Callable[[], Any]
+    links = listing(items).select("//h2/a")
+    return links.text_list
+
+
+@benchmark("text/text_list-smart")
+def bench_text_list_smart(items):
+    # type: (int) -> Callable[[], Any]
+    blocks = listing(items).select("//p[@class='description']")
+    return lambda: blocks.text_list(smart=True)
+
+
+@benchmark("text/attr_list")
+def bench_attr_list(items):
+    # type: (int) -> Callable[[], Any]
+    links = listing(items).select("//h2/a")
+    return lambda: links.attr_list("href")
+
+
+@benchmark("text/number")
+def bench_number(items):
+    # type: (int) -> Callable[[], Any]
+    cards = listing(items).select(CARD_QUERY).selector_list
+    return lambda: [card.select("./div[@class='price']").number() for card in cards]
+
+
+# Regular expressions and HTML
+
+
+@benchmark("rex/document")
+def bench_rex(items):
+    # type: (int) -> Callable[[], Any]
+    sel = listing(items, html_cache_size=10)
+    return lambda: sel.rex(r"Price: (\d+)").items
+
+
+@benchmark("rex/document-uncached")
+def bench_rex_uncached(items):
+    # type: (int) -> Callable[[], Any]
+    sel = listing(items)
+    return lambda: sel.rex(r"Price: (\d+)").items
+
+
+@benchmark("rex/source")
+def bench_rex_source(items):
+    # type: (int) -> Callable[[], Any]
+    sel = listing(items, keep_source=True)
+    return lambda: sel.rex(r"Price: (\d+)", source=True).items
+
+
+@benchmark("html/html-uncached")
+def bench_html(items):
+    # type: (int) -> Callable[[], Any]
+    sel = listing(items)
+    doc = sel.document()
+    assert doc is not None
+    cards = sel.select(CARD_QUERY).selector_list
+
+    def func():
+        # type: () -> Any
+        doc.invalidate()
+        return [card.html() for card in cards]
+
+    return func
+
+
+@benchmark("html/inner_html")
+def bench_inner_html(items):
+    # type: (int) -> Callable[[], Any]
+    cards = listing(items).select(CARD_QUERY).selector_list
+    return lambda: [card.inner_html() for card in cards]
+
+
+# Optional backends
+
+
+@benchmark("backend/pyquery")
+def bench_pyquery(items):
+    # type: (int) -> Callable[[], Any]
+    # pylint: disable-next=import-outside-toplevel
+    from selection.backend_pyquery import PyquerySelector  # noqa: PLC0415
+
+    sel = PyquerySelector.from_bytes(
+        load("listing", items)
+    )  # type: PyquerySelector[Any]
+    return lambda: sel.select(".item .price").text_list()
+
+
+@benchmark("backend/css")
+def bench_css(items):
+    # type: (int) -> Callable[[], Any]
+    # pylint: disable-next=import-outside-toplevel
+    from selection.backend_css import CssSelector  # noqa: PLC0415
+
+    sel = CssSelector.from_bytes(load("listing", items))  # type: CssSelector[Any]
+    return lambda: sel.select(".item .price").text_list()
+
+
+# Helpers of selection.util
+
+
+@benchmark("util/normalize_spaces")
+def bench_normalize_spaces(items):
+    # type: (int) -> Callable[[], Any]
+    text = make_text(items)
+    return lambda: util.normalize_spaces(text)
+
+
+@benchmark("util/decode_entities")
+def bench_decode_entities(items):
+    # type: (int) -> Callable[[], Any]
+    text = make_text(items)
+    return lambda: util.decode_entities(text)
+
+
+@benchmark("util/get_node_text-smart")
+def bench_get_node_text(items):
+    # type: (int) -> Callable[[], Any]
+    root = XpathSelector.from_bytes(load("nested", items)).node()  # type: Any
+    return lambda: util.get_node_text(root, smart=True)
+
+
+@benchmark("util/render_html")
+def bench_render_html(items):
+    # type: (int) -> Callable[[], Any]
+    root = XpathSelector.from_bytes(load("nested", items)).node()  # type: Any
+    return lambda: util.render_html(root)
+
+
+def run(
+    items,  # type: int
+    names=None,  # type: None | list[str]
+    repeat=REPEAT,  # type: int
+    min_time=MIN_TIME,  # type: float
+    report=None,  # type: None | Callable[[str, float], None]
+):
+    # type: (...) -> dict[str, float]
+    """Run benchmarks with given names or all benchmarks.
+
+    Return mapping of benchmark name to time of one call in seconds.
+    Benchmarks of not installed optional backends are skipped.
+    """
+    results = {}  # type: dict[str, float]
+    for bench in BENCHMARKS:
+        if names is not None and bench.name not in names:
+            continue
+        try:
+            func = bench.setup(items)
+        except ImportError as ex:
+            sys.stderr.write("Skip {}: {}\n".format(bench.name, ex))
+            continue
+        number = autorange(func, min_time)
+        results[bench.name] = measure(func, repeat, number)
+        if report:
+            report(bench.name, results[bench.name])
+    return results
+
+
+def compare_results(results, baseline, threshold=None):
+    # type: (dict[str, float], dict[str, float], None | float) -> list[str]
+    """Return names of benchmarks which are slower than the baseline.
+
+    The benchmark is slower if its time exceeds the baseline time by more
+    than the threshold of the benchmark or by more than `threshold` if it
+    is given. Benchmarks missing in the baseline are ignored.
+    """
+    thresholds = {x.name: x.threshold for x in BENCHMARKS}
+    slower = []
+    for name, elapsed in sorted(results.items()):
+        if name not in baseline:
+            continue
+        limit = threshold if threshold is not None else thresholds.get(name, THRESHOLD)
+        if elapsed > baseline[name] * (1 + limit):
+            slower.append(name)
+    return slower
+
+
+def environment():
+    # type: () -> dict[str, str]
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "lxml": ".".join(str(x) for x in lxml.etree.LXML_VERSION),
+        "machine": platform.machine(),
+    }
+
+
+def format_time(seconds):
+    # type: (float) -> str
+    if seconds < MILLISECOND:
+        return "{:.1f} us".format(seconds * 1e6)
+    return "{:.3f} ms".format(seconds * 1e3)
+
+
+def load_baseline(path):
+    # type: (str) -> dict[str, Any]
+    with open(path, "rb") as inp:
+        return cast("dict[str, Any]", json.loads(inp.read().decode("utf-8")))
+
+
+def save_baseline(path, size, results):
+    # type: (str, str, dict[str, float]) -> None
+    data = {"size": size, "environment": environment(), "results": results}
+    with open(path, "wb") as out:
+        out.write((json.dumps(data, indent=2, sort_keys=True) + "\n").encode("utf-8"))
+
+
+def parse_args():
+    # type: () -> argparse.Namespace
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", choices=sorted(SIZES), default="medium")
+    parser.add_argument("--filter", help="run benchmarks which names contain it")
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument("--min-time", type=float, default=MIN_TIME)
+    parser.add_argument("--save", metavar="FILE", help="save results as baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare with baseline")
+    parser.add_argument(
+        "--threshold", type=float, help="override thresholds of all benchmarks"
+    )
+    parser.add_argument("--list", action="store_true", help="list benchmarks")
+    opts = parser.parse_args()
+    if opts.compare:
+        saved = load_baseline(opts.compare)
+        if saved["size"] != opts.size:
+            parser.error(
+                "Baseline has been saved with --size {}".format(saved["size"])
+            )
+        opts.baseline = saved["results"]
+    else:
+        opts.baseline = {}
+    return opts
+
+
+def main():
+    # type: () -> None
+    opts = parse_args()
+    if opts.list:
+        for bench in BENCHMARKS:
+            print("{:<30} {:.0%}".format(bench.name, bench.threshold))
+        return
+    baseline = opts.baseline  # type: dict[str, float]
+
+    def report(name, elapsed):
+        # type: (str, float) -> None
+        line = "{:<30} {:>12}".format(name, format_time(elapsed))
+        if name in baseline:
+            line += " {:>12} {:>7.2f}x".format(
+                format_time(baseline[name]), elapsed / baseline[name]
+            )
+        print(line)
+        sys.stdout.flush()
+
+    names = [x.name for x in BENCHMARKS if not opts.filter or opts.filter in x.name]
+    results = run(SIZES[opts.size], names, opts.repeat, opts.min_time, report=report)
+    if opts.save:
+        save_baseline(opts.save, opts.size, results)
+    if opts.compare:
+        slower = compare_results(results, baseline, opts.threshold)
+        if slower:
+            # Measure again to tell real regressions from noise
+            print("Measuring again: {}".format(", ".join(slower)))
+            again = run(SIZES[opts.size], slower, opts.repeat, opts.min_time, report)
+            for name, elapsed in again.items():
+                results[name] = min(results[name], elapsed)
+            slower = compare_results(results, baseline, opts.threshold)
+        if slower:
+            print("Slower than baseline: {}".format(", ".join(slower)))
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# coding: utf-8
+"""Measure speed of text extraction on large document.
+
+Compare current implementation of `normalize_spaces` and `get_node_text`
+with the old ones which used uncompiled regular expression and evaluated
+string XPath query for each node.
+
+Run: PYTHONPATH=. python benchmarks/text.py [--items 5000] [--repeat 5]
+"""
+# from __future__ import annotations
+
+import argparse
+import re
+from typing import Any, Callable, List, cast  # pylint: disable=unused-import
+
+import lxml.html
+from lxml.etree import _Element
+
+from benchmarks.common import compare
+from selection import XpathSelector
+from selection.util import SMART_TEXT_QUERY, get_node_text, normalize_spaces
+
+
+def old_normalize_spaces(val):
+    # type: (str) -> str
+    return re.sub(r"\s+", " ", val).strip()
+
+
+def old_get_node_text(node, smart=False, normalize_space=True):
+    # type: (_Element, bool, bool) -> str
+    # pylint: disable=deprecated-typing-alias
+    value = (
+        " ".join(cast(List[str], node.xpath(SMART_TEXT_QUERY)))
+        if smart
+        else cast(lxml.html.HtmlElement, node).text_content()
+    )
+    if normalize_space:
+        return old_normalize_spaces(value)
+    return value
+
+
+def make_document(items):
+    # type: (int) -> bytes
+    rows = "".join(
+        "<li>\n  <a href='/{0}'>Item  {0}</a>\n\t<b>bold\n text</b>"
+        "<script>var x = {0};</script></li>".format(x)
+        for x in range(items)
+    )
+    return "<html><body><ul>{}</ul></body></html>".format(rows).encode("utf-8")
+
+
+def main():
+    # type: () -> None
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    opts = parser.parse_args()
+    root = XpathSelector.from_bytes(make_document(opts.items)).node()
+    nodes = root.xpath("//li")
+    texts = [node.text_content() for node in nodes]
+    cases = [
+        (
+            "normalize_spaces",
+            lambda: [old_normalize_spaces(x) for x in texts],
+            lambda: [normalize_spaces(x) for x in texts],
+        ),
+        (
+            "get_node_text",
+            lambda: [old_get_node_text(x) for x in nodes],
+            lambda: [get_node_text(x) for x in nodes],
+        ),
+        (
+            "get_node_text smart",
+            lambda: [old_get_node_text(x, smart=True) for x in nodes],
+            lambda: [get_node_text(x, smart=True) for x in nodes],
+        ),
+        (
+            "whole document smart",
+            lambda: old_get_node_text(root, smart=True),
+            lambda: get_node_text(root, smart=True),
+        ),
+    ]  # type: list[tuple[str, Callable[[], Any], Callable[[], Any]]]
+    compare(cases, opts.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# coding: utf-8
+"""Measure how extract_many scales with number of threads and processes.
+
+Run: PYTHONPATH=. python benchmarks/threads.py [--docs 2000] [--workers 1,2,4,8]
+"""
+# from __future__ import annotations
+
+import argparse
+import multiprocessing
+import time
+
+from selection import compile_plan
+from selection.bulk import extract_many
+
+SCHEMA = {
+    "title": "//h1",
+    "price": ("//div[@class='price']", "number", None),
+    "links": ("//ul/li/a", ("attr_list", "href")),
+    "names": ("//ul/li/a", "text_list"),
+    "description": ("//div[@id='description']", "text"),
+}
+
+
+def make_document(idx, items=300):
+    # type: (int, int) -> bytes
+    rows = "".join(
+        '<li class="item"><a href="/item/{0}">Item {0} <b>name</b></a></li>'.format(x)
+        for x in range(items)
+    )
+    return (
+        "<html><head><title>Doc {0}</title></head><body>"
+        "<h1>Product {0}</h1><div class='price'>Price: {0} USD</div>"
+        "<ul>{1}</ul><div id='description'>{2}</div>"
+        "</body></html>".format(idx, rows, "Lorem ipsum dolor sit amet. " * 200)
+    ).encode("utf-8")
+
+
+def run(docs, mode, workers):
+    # type: (list[bytes], str, int) -> float
+    plan = compile_plan(SCHEMA)
+    started = time.time()
+    for _ in extract_many(docs, plan, workers=workers, chunksize=20, mode=mode):
+        pass
+    return time.time() - started
+
+
+def main():
+    # type: () -> None
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument(
+        "--workers",
+        default=",".join(
+            str(x) for x in (1, 2, 4, 8) if x <= multiprocessing.cpu_count()
+        ),
+    )
+    opts = parser.parse_args()
+    docs = [make_document(x) for x in range(opts.docs)]
+    print("CPU count: {}".format(multiprocessing.cpu_count()))
+    base = run(docs, "thread", 0)
+    print("{:<10} {:>7} {:>10} {:>8}".format("mode", "workers", "docs/sec", "speedup"))
+    print("{:<10} {:>7} {:>10.0f} {:>8.2f}".format("local", 0, len(docs) / base, 1))
+    for mode in ("thread", "process"):
+        for workers in (int(x) for x in opts.workers.split(",")):
+            elapsed = run(docs, mode, workers)
+            print(
+                "{:<10} {:>7} {:>10.0f} {:>8.2f}".format(
+                    mode, workers, len(docs) / elapsed, base / elapsed
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
 from selection.backend_lxml import XpathSelector
 from selection.base import RexResultList, Selector, SelectorList
+from selection.cache import LruCache
+from selection.document import Document
 from selection.errors import SelectionNotFoundError
+from selection.extract import Field
+from selection.plan import ExtractionPlan, compile_plan
 
 __all__ = [
+    "Document",
+    "ExtractionPlan",
+    "Field",
+    "LruCache",
     "RexResultList",
     "SelectionNotFoundError",
     "Selector",
     "SelectorList",
     "XpathSelector",
+    "compile_plan",
 ]
 
 __version__ = "2.0.1"
@@ -0,0 +1,271 @@
+"""Asyncio-friendly API which runs parsing and queries in an executor.
+
+Functions and methods of this module return asyncio futures, so they could
+be awaited in coroutines without blocking the event loop. Python 3 only.
+"""
+# from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from contextlib import suppress
+from functools import partial
+from types import TracebackType
+from typing import (  # pylint: disable=unused-import
+    Any,
+    Callable,
+    Deque,
+    Mapping,
+    Tuple,
+    cast,
+)
+
+import six
+
+from .backend_lxml import XpathSelector
+from .base import Selector, SelectorList
+from .extract import FieldSpec  # pylint: disable=unused-import
+from .plan import ExtractionPlan, compile_plan
+from .util import parse_document
+
+__all__ = ["AsyncExtractor", "aextract", "aparse", "aselect"]
+# pylint: disable=deprecated-typing-alias
+QueueItem = Tuple[
+    asyncio.AbstractEventLoop,
+    "asyncio.Future[Any]",
+    Callable[..., Any],
+    Tuple[Any, ...],
+]
+DEFAULT_EXTRACTOR = None  # type: None | AsyncExtractor
+
+
+def get_loop():
+    # type: () -> asyncio.AbstractEventLoop
+    try:
+        return asyncio.get_running_loop()
+    except (AttributeError, RuntimeError):
+        return asyncio.get_event_loop()
+
+
+def parse_selector(data, parser="html"):
+    # type: (bytes | str, str) -> XpathSelector[Any]
+    return XpathSelector(parse_document(data, parser=parser))
+
+
+def extract_document(plan, document, parser="html"):
+    # type: (ExtractionPlan, Any, str) -> dict[str, Any]
+    """Apply plan to raw document, DOM node or selector."""
+    if isinstance(document, (six.binary_type, six.text_type)):
+        document = parse_document(document, parser=parser)
+    return plan.apply(document)
+
+
+class AsyncExtractor(object):  # noqa: UP004
+    """Runner of parsing and extraction jobs in a bounded executor.
+
+    No more than `max_in_flight` jobs are submitted to the executor at any
+    moment, other jobs wait in the queue. Cancelling the returned future
+    removes the job from the queue or cancels the executor job if it is
+    not started yet. The job which is already running is not interrupted
+    but its result is discarded.
+
+    The extractor could be shared by several event loops and threads.
+    The slot of finished job is released in the executor thread, so the
+    slot is released even if the event loop which submitted the job has
+    been closed. Queued jobs of closed event loops are dropped.
+
+    By default the extractor runs jobs in its own pool of threads. Pass
+    `ProcessPoolExecutor` to `executor` to run `aextract` jobs in processes,
+    in that case documents must be passed as raw bytes or strings.
+    """
+
+    def __init__(
+        self,
+        executor=None,  # type: None | Executor
+        max_workers=None,  # type: None | int
+        max_in_flight=None,  # type: None | int
+        parser="html",  # type: str
+    ):
+        # type: (...) -> None
+        if max_workers is None:
+            max_workers = multiprocessing.cpu_count()
+        self._own_executor = executor is None
+        self.executor = (
+            ThreadPoolExecutor(max_workers) if executor is None else executor
+        )  # type: Executor
+        self.max_in_flight = max_in_flight or 2 * max_workers
+        self.parser = parser
+        self.in_flight = 0
+        self._queue = deque()  # type: Deque[QueueItem]
+        # Guards in_flight and _queue
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        # type: () -> AsyncExtractor
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # type: (type[Exception], Exception, TracebackType) -> None
+        self.close()
+
+    def close(self, wait=True):
+        # type: (bool) -> None
+        """Shutdown the executor if it was created by the extractor."""
+        if self._own_executor:
+            self.executor.shutdown(wait=wait)
+
+    def submit(self, func, *args):  # noqa: ANN002
+        # type: (Callable[..., Any], Any) -> asyncio.Future[Any]
+        """Schedule func(*args) call in the executor.
+
+        Must be called from the thread running the event loop.
+        """
+        loop = get_loop()
+        future = loop.create_future()
+        with self._lock:
+            self._queue.append((loop, future, func, args))
+        self._dispatch()
+        return future
+
+    def _dispatch(self):
+        # type: () -> None
+        """Start queued jobs while there are free slots.
+
+        Could be called from any thread.
+        """
+        while True:
+            with self._lock:
+                item = self._next_job()
+                if item is None:
+                    return
+                self.in_flight += 1
+            self._start(*item)
+
+    def _next_job(self):
+        # type: () -> None | QueueItem
+        # Must be called with the lock acquired
+        while self._queue and self.in_flight < self.max_in_flight:
+            item = self._queue.popleft()
+            loop, future = item[0], item[1]
+            # Skip jobs cancelled while waiting in the queue and jobs
+            # which nobody could wait for
+            if not future.done() and not loop.is_closed():
+                return item
+        return None
+
+    def _start(
+        self,
+        loop,  # type: asyncio.AbstractEventLoop
+        future,  # type: asyncio.Future[Any]
+        func,  # type: Callable[..., Any]
+        args,  # type: tuple[Any, ...]
+    ):
+        # type: (...) -> None
+        try:
+            job = self.executor.submit(func, *args)
+        except RuntimeError as ex:
+            # The executor has been shut down
+            job = Future()
+            job.set_exception(ex)
+        job.add_done_callback(partial(self._on_job_done, loop, future))
+        # RuntimeError means the event loop is closed
+        with suppress(RuntimeError):
+            loop.call_soon_threadsafe(self._link_cancel, future, job)
+
+    def _link_cancel(self, future, job):
+        # type: (asyncio.Future[Any], Future[Any]) -> None
+        # Asyncio future could be used only in the thread of its loop
+        if future.cancelled():
+            job.cancel()
+        else:
+            future.add_done_callback(lambda _: future.cancelled() and job.cancel())
+
+    def _on_job_done(self, loop, future, job):
+        # type: (asyncio.AbstractEventLoop, asyncio.Future[Any], Future[Any]) -> None
+        # Could be called from any thread
+        with self._lock:
+            self.in_flight -= 1
+        with suppress(RuntimeError):
+            loop.call_soon_threadsafe(self._complete, future, job)
+        self._dispatch()
+
+    def _complete(self, future, job):
+        # type: (asyncio.Future[Any], Future[Any]) -> None
+        if future.done():
+            return
+        if job.cancelled():
+            future.cancel()
+        elif job.exception() is not None:
+            future.set_exception(cast(BaseException, job.exception()))
+        else:
+            future.set_result(job.result())
+
+    def aparse(self, data):
+        # type: (bytes | str) -> asyncio.Future[XpathSelector[Any]]
+        """Build selector from raw document."""
+        return self.submit(parse_selector, data, self.parser)
+
+    def aselect(
+        self,
+        selector,  # type: Selector[Any]
+        query,  # type: str
+        lazy=False,  # type: bool
+        first=False,  # type: bool
+    ):
+        # type: (...) -> asyncio.Future[SelectorList[Any]]
+        return self.submit(partial(selector.select, query, lazy=lazy, first=first))
+
+    def aextract(
+        self,
+        document,  # type: Any
+        schema,  # type: ExtractionPlan | Mapping[str, FieldSpec]
+    ):
+        # type: (...) -> asyncio.Future[dict[str, Any]]
+        """Extract schema fields from the document.
+
+        The document could be raw bytes or string, DOM node or selector.
+        Pass precompiled `ExtractionPlan` to avoid compiling the schema
+        in each call.
+        """
+        plan = schema if isinstance(schema, ExtractionPlan) else compile_plan(schema)
+        return self.submit(extract_document, plan, document, self.parser)
+
+
+def get_default_extractor():
+    # type: () -> AsyncExtractor
+    global DEFAULT_EXTRACTOR  # noqa: PLW0603 pylint: disable=global-statement
+    if DEFAULT_EXTRACTOR is None:
+        DEFAULT_EXTRACTOR = AsyncExtractor()
+    return DEFAULT_EXTRACTOR
+
+
+def aparse(
+    data,  # type: bytes | str
+    extractor=None,  # type: None | AsyncExtractor
+):
+    # type: (...) -> asyncio.Future[XpathSelector[Any]]
+    return (extractor or get_default_extractor()).aparse(data)
+
+
+def aselect(
+    selector,  # type: Selector[Any]
+    query,  # type: str
+    lazy=False,  # type: bool
+    first=False,  # type: bool
+    extractor=None,  # type: None | AsyncExtractor
+):
+    # type: (...) -> asyncio.Future[SelectorList[Any]]
+    return (extractor or get_default_extractor()).aselect(
+        selector, query, lazy=lazy, first=first
+    )
+
+
+def aextract(
+    document,  # type: Any
+    schema,  # type: ExtractionPlan | Mapping[str, FieldSpec]
+    extractor=None,  # type: None | AsyncExtractor
+):
+    # type: (...) -> asyncio.Future[dict[str, Any]]
+    return (extractor or get_default_extractor()).aextract(document, schema)
@@ -0,0 +1,95 @@
+"""Backend which evaluates CSS selectors on lxml nodes.
+
+CSS queries are translated into XPath with `cssselect` package and compiled
+once: the compiled XPath objects are stored in the XPath cache of
+`selection.backend_lxml` module.
+"""
+# from __future__ import annotations
+
+from typing import Any, List, cast
+
+from cssselect import HTMLTranslator  # pylint: disable=import-error
+from lxml.etree import XPath, _Element
+from six.moves.collections_abc import Iterable  # pylint: disable=import-error
+
+from .backend_lxml import (
+    LxmlNodeSelector,
+    LxmlNodeT,
+    get_xpath_cache,
+    make_context_xpath,
+    make_xpath,
+)
+
+__all__ = [
+    "CssSelector",
+    "compile_context_css",
+    "compile_css",
+    "compile_first_css",
+    "css_to_xpath",
+]
+CSS_TRANSLATOR = HTMLTranslator()
+
+
+def css_to_xpath(query):
+    # type: (str) -> str
+    """Translate CSS selector into XPath query.
+
+    Raise `cssselect.SelectorError` if the query is not valid CSS selector.
+    """
+    return CSS_TRANSLATOR.css_to_xpath(query)
+
+
+def compile_css(query):
+    # type: (str) -> XPath
+    """Return compiled XPath object which finds nodes matching CSS selector."""
+    return get_xpath_cache().get_or_create(
+        ("css", query), lambda: make_xpath(css_to_xpath(query))
+    )
+
+
+def compile_first_css(query):
+    # type: (str) -> XPath
+    """Return compiled XPath object which finds first node matching CSS selector."""
+    return get_xpath_cache().get_or_create(
+        ("css-first", query), lambda: make_xpath("({})[1]".format(css_to_xpath(query)))
+    )
+
+
+def compile_context_css(query):
+    # type: (str) -> None | XPath
+    """Return XPath object which evaluates CSS selector for each node of `$ctx`.
+
+    Return None if the selector is a group of selectors.
+    """
+    return cast(
+        "XPath | None",
+        cast(Any, get_xpath_cache()).get_or_create(
+            ("css-context", query), lambda: make_context_xpath(css_to_xpath(query))
+        ),
+    )
+
+
+class CssSelector(LxmlNodeSelector[LxmlNodeT]):
+    """Selector which queries are CSS selectors.
+
+    The query is searched among the node itself and all its descendants.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def context_xpath(cls, query):
+        # type: (str) -> None | XPath
+        return compile_context_css(query)
+
+    def process_query(self, query):
+        # type: (str) -> Iterable[LxmlNodeT]
+        # pylint: disable=deprecated-typing-alias
+        return cast(List[LxmlNodeT], compile_css(query)(cast(_Element, self.node())))
+
+    def process_first_query(self, query):
+        # type: (str) -> Iterable[LxmlNodeT]
+        # pylint: disable=deprecated-typing-alias
+        return cast(
+            List[LxmlNodeT], compile_first_css(query)(cast(_Element, self.node()))
+        )
@@ -1,26 +1,257 @@
 # from __future__ import annotations
 
 from abc import abstractmethod
-from typing import Any, List, TypeVar, cast
+from itertools import islice
+from typing import (  # pylint: disable=unused-import
+    IO,
+    Any,
+    Callable,
+    List,
+    TypeVar,
+    cast,
+)
 
 import six
-from lxml.etree import XPath, _Element
+from lxml.etree import XPath, XPathEvalError, XPathSyntaxError, _Element
 from six.moves.collections_abc import Iterable  # pylint: disable=import-error
 
-from . import util
-from .base import Selector, SelectorList
+from . import profiling, util
+from .base import Selector, SelectorList, takes_document
+from .cache import LruCache, ThreadLocalCache  # pylint: disable=unused-import
 from .const import UNDEFINED
+from .document import Document
 from .errors import SelectionNotFoundError
+from .index import DocumentIndex  # pylint: disable=unused-import
 
-__all__ = ["XpathSelector"]
-XPATH_CACHE = {}
+__all__ = ["XpathSelector", "compile_xpath", "get_xpath_cache", "set_xpath_cache"]
+XPATH_CACHE_SIZE = 1000
+XPATH_CACHE = LruCache(
+    maxsize=XPATH_CACHE_SIZE
+)  # type: LruCache[XPath] | ThreadLocalCache[XPath]
 REGEXP_NS = "http://exslt.org/regular-expressions"
 LxmlNodeT = TypeVar("LxmlNodeT", bound=_Element)
+LxmlSelectorT = TypeVar("LxmlSelectorT", bound="LxmlNodeSelector[Any]")
+NODE_CLASSES = {}  # type: dict[type[Any], tuple[type[Any], type[Any], type[Any]]]
+
+
+def get_xpath_cache():
+    # type: () -> LruCache[XPath] | ThreadLocalCache[XPath]
+    return XPATH_CACHE
+
+
+def set_xpath_cache(cache):
+    # type: (LruCache[XPath] | ThreadLocalCache[XPath]) -> None
+    """Replace the cache which stores compiled XPath objects.
+
+    Use it to set custom size limit for the process, e.g.
+    `set_xpath_cache(LruCache(maxsize=10000))`. In multi-threaded programs
+    use `ThreadLocalCache` to let threads evaluate XPath queries
+    in parallel.
+    """
+    global XPATH_CACHE  # noqa: PLW0603 pylint: disable=global-statement
+    XPATH_CACHE = cache
+
+
+profiling.register_cache("xpath", get_xpath_cache)
+
+
+def make_xpath(query):
+    # type: (str) -> XPath
+    """Compile XPath object without using the cache."""
+    return XPath(query, namespaces={"re": REGEXP_NS})
+
+
+def make_first_xpath(query):
+    # type: (str) -> XPath
+    """Compile XPath which returns only first node found by the `query`.
+
+    If the query could not be rewritten that way then return compiled
+    original query.
+    """
+    try:
+        return make_xpath("({})[1]".format(query))
+    except XPathSyntaxError:
+        return make_xpath(query)
+
+
+def compile_xpath(query):
+    # type: (str) -> XPath
+    return XPATH_CACHE.get_or_create(query, lambda: make_xpath(query))
+
+
+def compile_first_xpath(query):
+    # type: (str) -> XPath
+    return XPATH_CACHE.get_or_create(("first", query), lambda: make_first_xpath(query))
+
+
+def make_context_xpath(query):
+    # type: (str) -> None | XPath
+    """Compile XPath object which evaluates `query` for each node of `$ctx`.
+
+    The `$ctx` variable must be a list of nodes. Return None if the query
+    is not a relative location path and could not be evaluated this way.
+    """
+    query = query.strip()
+    if not query or query.startswith("/") or "|" in query:
+        return None
+    try:
+        return make_xpath("$ctx/" + query)
+    except XPathSyntaxError:
+        return None
+
+
+def compile_context_xpath(query):
+    # type: (str) -> None | XPath
+    return cast(
+        "XPath | None",
+        cast(Any, XPATH_CACHE).get_or_create(
+            ("context", query), lambda: make_context_xpath(query)
+        ),
+    )
+
+
+def uses_own_method(cls, name):
+    # type: (type[Any], str) -> bool
+    """Check that selector class does not override LxmlNodeSelector method.
+
+    Batch methods of LxmlNodeSelector skip creating selectors so they could
+    be used only if single-node method is not overridden.
+    """
+    return six.get_unbound_function(getattr(cls, name)) is six.get_unbound_function(
+        getattr(LxmlNodeSelector, name)
+    )
 
 
 class LxmlNodeSelector(Selector[LxmlNodeT]):
     __slots__ = ()
 
+    @classmethod
+    def from_bytes(
+        cls,  # type: type[LxmlSelectorT]
+        data,  # type: bytes
+        encoding=None,  # type: None | str
+        parser="html",  # type: str
+        use_index=False,  # type: bool
+        memo_size=0,  # type: None | int
+        html_cache_size=0,  # type: None | int
+        keep_source=False,  # type: bool
+        **options  # type: Any
+    ):
+        # type: (...) -> LxmlSelectorT
+        """Parse the document and return selector of its root node.
+
+        The lxml parser is reused between calls in the same thread.
+
+        :param encoding: encoding of the document, overrides the encoding
+            declared in the document
+        :param parser: "html" or "xml"
+        :param use_index: answer simple queries like `//a` from the index
+            of elements, see `Document`
+        :param memo_size: number of query results to remember, zero
+            disables the memo, see `Document`
+        :param html_cache_size: number of nodes which serialized HTML
+            is cached, zero disables the cache, see `Document`
+        :param keep_source: keep `data` in the `Document` of the selector
+            to make `rex(..., source=True)` work
+        :param options: options of lxml parser e.g. huge_tree=True,
+            remove_blank_text=True, remove_comments=True
+        """
+        root = util.parse_document(data, parser, encoding, **options)
+        return cls(root)._bind(  # noqa: SLF001
+            Document(
+                root,
+                source=data if keep_source else None,
+                encoding=encoding,
+                html_cache_size=html_cache_size,
+                use_index=use_index,
+                memo_size=memo_size,
+            )
+        )
+
+    @classmethod
+    def from_string(
+        cls,  # type: type[LxmlSelectorT]
+        data,  # type: str
+        parser="html",  # type: str
+        use_index=False,  # type: bool
+        memo_size=0,  # type: None | int
+        html_cache_size=0,  # type: None | int
+        keep_source=False,  # type: bool
+        **options  # type: Any
+    ):
+        # type: (...) -> LxmlSelectorT
+        """Parse the document and return selector of its root node.
+
+        See `from_bytes` for description of arguments.
+        """
+        root = util.parse_document(data, parser, None, **options)
+        return cls(root)._bind(  # noqa: SLF001
+            Document(
+                root,
+                source=data if keep_source else None,
+                html_cache_size=html_cache_size,
+                use_index=use_index,
+                memo_size=memo_size,
+            )
+        )
+
+    @classmethod
+    def from_mmap(
+        cls,  # type: type[LxmlSelectorT]
+        path,  # type: str
+        encoding=None,  # type: None | str
+        parser="html",  # type: str
+        chunk_size=util.MMAP_CHUNK_SIZE,  # type: int
+        use_index=False,  # type: bool
+        memo_size=0,  # type: None | int
+        html_cache_size=0,  # type: None | int
+        **options  # type: Any
+    ):
+        # type: (...) -> LxmlSelectorT
+        """Parse memory-mapped file and return selector of its root node.
+
+        The file is fed to lxml incremental parser in chunks of `chunk_size`
+        bytes, the whole content of the file is never copied into memory.
+        Use it for very large documents. See `from_bytes` for description
+        of other arguments.
+        """
+        root = util.parse_mmap(path, parser, encoding, chunk_size, **options)
+        return cls(root)._bind(  # noqa: SLF001
+            Document(
+                root,
+                html_cache_size=html_cache_size,
+                use_index=use_index,
+                memo_size=memo_size,
+            )
+        )
+
+    @classmethod
+    def from_file(
+        cls,  # type: type[LxmlSelectorT]
+        source,  # type: str | IO[Any]
+        encoding=None,  # type: None | str
+        parser="html",  # type: str
+        use_index=False,  # type: bool
+        memo_size=0,  # type: None | int
+        html_cache_size=0,  # type: None | int
+        **options  # type: Any
+    ):
+        # type: (...) -> LxmlSelectorT
+        """Parse the file and return selector of its root node.
+
+        The `source` is file name or file object opened in binary mode.
+        See `from_bytes` for description of other arguments.
+        """
+        root = util.parse_file(source, parser, encoding, **options)
+        return cls(root)._bind(  # noqa: SLF001
+            Document(
+                root,
+                html_cache_size=html_cache_size,
+                use_index=use_index,
+                memo_size=memo_size,
+            )
+        )
+
     @abstractmethod
     def process_query(self, query):
         # type: (str) -> Iterable[LxmlNodeT]
@@ -30,17 +261,225 @@ class LxmlNodeSelector(Selector[LxmlNodeT]):
         # type: () -> bool
         return isinstance(self.node(), six.string_types)
 
-    def select(self, query):
-        # type: (str) -> SelectorList[LxmlNodeT]
+    @classmethod
+    def text_batch(cls, nodes, smart=False, normalize_space=True):
+        # type: (Iterable[LxmlNodeT], bool, bool) -> list[str]
+        if not uses_own_method(cls, "text"):
+            return super(LxmlNodeSelector, cls).text_batch(  # noqa: UP008
+                nodes, smart=smart, normalize_space=normalize_space
+            )
+        get_node_text = util.get_node_text
+        text_type = six.text_type
+        return [
+            text_type(get_node_text(x, smart=smart, normalize_space=normalize_space))
+            for x in nodes
+        ]
+
+    @classmethod
+    def attr_batch(cls, nodes, key, default=UNDEFINED):
+        # type: (Iterable[LxmlNodeT], str, Any) -> list[Any]
+        if not uses_own_method(cls, "attr"):
+            return super(LxmlNodeSelector, cls).attr_batch(  # noqa: UP008
+                nodes, key, default=default
+            )
+        result = []
+        for node in nodes:
+            if isinstance(node, six.string_types):
+                raise TypeError("Text node selectors do not allow attr method")
+            value = node.get(key)
+            if value is None:
+                if default is UNDEFINED:
+                    raise SelectionNotFoundError("No such attribute: {}".format(key))
+                value = default
+            result.append(value)
+        return result
+
+    @classmethod
+    def node_classes(cls):
+        # type: () -> tuple[type[Any], type[Any], type[Any]]
+        """Return (class, element class, text node class) tuple.
+
+        The element and text node classes are subclasses of the selector
+        class which methods do not check the type of the node. They are
+        used for nodes returned by `select` method: the type of each node
+        is checked once, when its selector is created. Their names are
+        the name of the class with "[element]" and "[text]" suffixes.
+        """
+        try:
+            return NODE_CLASSES[cls]
+        except KeyError:
+            classes = (
+                cls,
+                make_node_class(cls, LxmlElementSelector, "element"),
+                make_node_class(cls, LxmlTextNodeSelector, "text"),
+            )
+            for item in classes:
+                NODE_CLASSES[item] = classes
+            return classes
+
+    @classmethod
+    def context_xpath(cls, query):  # noqa: ARG003 pylint: disable=unused-argument
+        # type: (str) -> None | XPath
+        """Return XPath object which evaluates the query for each node of `$ctx`.
+
+        Return None if the query could not be evaluated this way.
+        """
+        return None  # noqa: RET501
+
+    @classmethod
+    def select_all(cls, selectors, query, dedupe=False):
+        # type: (list[Selector[LxmlNodeT]], str, bool) -> SelectorList[LxmlNodeT]
+        """Run the query for each selector and return list of all found nodes.
+
+        In dedupe mode the query is evaluated for all selectors in one go
+        if the backend could build context XPath for it. Found nodes are
+        returned in document order.
+        """
+        if not dedupe or not selectors:
+            return super(LxmlNodeSelector, cls).select_all(  # noqa: UP008
+                selectors, query, dedupe=dedupe
+            )
+        first = cast(LxmlNodeSelector[LxmlNodeT], selectors[0])
+        nodes = [x.node() for x in selectors]
+        if any(isinstance(x, six.string_types) for x in nodes):
+            raise TypeError("Text node selectors do not allow select method")
+        xpath_obj = cls.context_xpath(query)
+        result = None
+        if xpath_obj is not None:
+            result = xpath_obj(nodes[0], ctx=cast(Any, nodes))
+        if not isinstance(result, list):
+            # Evaluate the query for each node, then restore document order
+            found = super(LxmlNodeSelector, cls).select_all(  # noqa: UP008
+                selectors, query, dedupe=True
+            )
+            result = found.node_list()
+            if not result or any(isinstance(x, six.string_types) for x in result):
+                return found
+            result = compile_xpath("$nodes | $nodes")(nodes[0], nodes=result)
+        # pylint: disable=protected-access,deprecated-typing-alias
+        return first._wrap_node_list(  # noqa: SLF001
+            cast(List[LxmlNodeT], result), query
+        )
+
+    def _wrap_node_list(self, nodes, query, lazy=False):
+        # type: (Iterable[LxmlNodeT], str, bool) -> SelectorList[LxmlNodeT]
+        cls, element_cls, text_cls = self.node_classes()
+        document = self._document
+        string_types = six.string_types
+        if not takes_document(cls):
+            selectors = (
+                text_cls(x) if isinstance(x, string_types) else element_cls(x)
+                for x in nodes
+            )
+            if document is not None:
+                # pylint: disable-next=protected-access
+                selectors = (x._bind(document) for x in selectors)  # noqa: SLF001
+            return SelectorList(selectors if lazy else list(selectors), cls, query)
+        if lazy:
+            return SelectorList(
+                (
+                    text_cls(x, document)
+                    if isinstance(x, string_types)
+                    else element_cls(x, document)
+                    for x in nodes
+                ),
+                cls,
+                query,
+            )
+        return SelectorList(
+            [
+                text_cls(x, document)
+                if isinstance(x, string_types)
+                else element_cls(x, document)
+                for x in nodes
+            ],
+            cls,
+            query,
+        )
+
+    def select(self, query, lazy=False, first=False):
+        # type: (str, bool, bool) -> SelectorList[LxmlNodeT]
         if self.is_text_node():
             raise TypeError("Text node selectors do not allow select method")
-        return super(LxmlNodeSelector, self).select(query)  # noqa: UP008
+        return super(LxmlNodeSelector, self).select(  # noqa: UP008
+            query, lazy=lazy, first=first
+        )
+
+    def _select_indexed(
+        self,
+        query,  # type: str
+        lookup,  # type: Callable[[DocumentIndex], list[_Element]]
+    ):
+        # type: (...) -> SelectorList[LxmlNodeT]
+        if self.is_text_node():
+            raise TypeError("Text node selectors do not allow select method")
+        nodes = (
+            compile_xpath(query)(cast(_Element, self.node()))
+            if self._document is None
+            else lookup(self._document.index())
+        )
+        # pylint: disable=deprecated-typing-alias
+        return self._wrap_node_list(cast(List[LxmlNodeT], nodes), query)
+
+    def by_id(self, value):
+        # type: (str) -> SelectorList[LxmlNodeT]
+        """Find the first element of the document with given id.
+
+        Like the `//*[@id="value"]` XPath query, the whole document is
+        searched, not only the node of the selector. If the selector has
+        the document then the index of the document is used.
+        """
+        return self._select_indexed(
+            "(//*[@id={}])[1]".format(util.xpath_literal(value)),
+            lambda index: [x for x in [index.by_id(value)] if x is not None],
+        )
+
+    def by_class(self, name):
+        # type: (str) -> SelectorList[LxmlNodeT]
+        """Find elements of the document which have given class name.
+
+        See `by_id` for details.
+        """
+        return self._select_indexed(
+            "//*[contains(concat(' ', normalize-space(@class), ' '), {})]".format(
+                util.xpath_literal(" {} ".format(name))
+            ),
+            lambda index: index.by_class(name),
+        )
+
+    def by_tag(self, tag):
+        # type: (str) -> SelectorList[LxmlNodeT]
+        """Find elements of the document with given tag, "*" means any tag.
+
+        See `by_id` for details.
+        """
+        return self._select_indexed("//" + tag, lambda index: index.by_tag(tag))
 
     def html(self):
         # type: () -> str
         if self.is_text_node():
             return six.text_type(self.node())
-        return util.render_html(cast(_Element, self.node()))
+        if self._document is None:
+            return util.render_html(cast(_Element, self.node()))
+        return self._document.html(self.node(), util.render_html)
+
+    def inner_html(self):
+        # type: () -> str
+        """Return HTML of the node content: its text and all child nodes."""
+        if self.is_text_node():
+            return six.text_type(self.node())
+        return util.render_inner_html(cast(_Element, self.node()))
+
+    def html_bytes(self, encoding="utf-8"):
+        # type: (str) -> bytes
+        """Return HTML of the node encoded into bytes.
+
+        The node is serialized directly into bytes, chars which could not
+        be encoded are written as numeric entities.
+        """
+        if self.is_text_node():
+            return six.text_type(self.node()).encode(encoding)
+        return util.render_html_bytes(cast(_Element, self.node()), encoding=encoding)
 
     def attr(self, key, default=UNDEFINED):
         # type: (str, Any) -> Any
@@ -67,16 +506,198 @@ class LxmlNodeSelector(Selector[LxmlNodeT]):
         )
 
 
+# pylint: disable-next=abstract-method
+class LxmlElementSelector(LxmlNodeSelector[LxmlNodeT]):
+    """Methods of selector which node is known to be an element.
+
+    Methods of this class do not check the type of the node. They are
+    copied into the element variant of each selector class, see
+    `LxmlNodeSelector.node_classes`.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, node, document=None):  # pylint: disable=super-init-not-called
+        # type: (LxmlNodeT, None | Document[Any]) -> None
+        # pylint: disable=assigning-non-slot
+        self._node = node
+        self._document = document
+        if isinstance(node, six.string_types):
+            # The variant is constructed directly e.g. `sel.__class__(node)`
+            self.__class__ = self.node_classes()[2]
+
+    def is_text_node(self):
+        # type: () -> bool
+        return False
+
+    def select(self, query, lazy=False, first=False):
+        # type: (str, bool, bool) -> SelectorList[LxmlNodeT]
+        # Skip the check of node type done by LxmlNodeSelector.select
+        return Selector.select(self, query, lazy=lazy, first=first)
+
+    def html(self):
+        # type: () -> str
+        if self._document is None:
+            return util.render_html(self._node)
+        return self._document.html(self._node, util.render_html)
+
+    def inner_html(self):
+        # type: () -> str
+        return util.render_inner_html(self._node)
+
+    def html_bytes(self, encoding="utf-8"):
+        # type: (str) -> bytes
+        return util.render_html_bytes(self._node, encoding=encoding)
+
+    def attr(self, key, default=UNDEFINED):
+        # type: (str, Any) -> Any
+        value = self._node.get(key)
+        if value is None:
+            if default is UNDEFINED:
+                raise SelectionNotFoundError("No such attribute: {}".format(key))
+            return default
+        return value
+
+    def text(self, smart=False, normalize_space=True):
+        # type: (bool, bool) -> str
+        return six.text_type(
+            util.get_node_text(self._node, smart=smart, normalize_space=normalize_space)
+        )
+
+
+# pylint: disable-next=abstract-method
+class LxmlTextNodeSelector(LxmlNodeSelector[LxmlNodeT]):
+    """Methods of selector which node is known to be a string.
+
+    The string is a text node or result of XPath query like "//a/@href".
+    See `LxmlElementSelector`.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, node, document=None):  # pylint: disable=super-init-not-called
+        # type: (LxmlNodeT, None | Document[Any]) -> None
+        # pylint: disable=assigning-non-slot
+        self._node = node
+        self._document = document
+        if not isinstance(node, six.string_types):
+            # The variant is constructed directly e.g. `sel.__class__(node)`
+            self.__class__ = self.node_classes()[1]
+
+    def is_text_node(self):
+        # type: () -> bool
+        return True
+
+    def select(self, query, lazy=False, first=False):  # noqa: ARG002
+        # type: (str, bool, bool) -> SelectorList[LxmlNodeT]
+        raise TypeError("Text node selectors do not allow select method")
+
+    def html(self):
+        # type: () -> str
+        return six.text_type(self._node)
+
+    def inner_html(self):
+        # type: () -> str
+        return six.text_type(self._node)
+
+    def html_bytes(self, encoding="utf-8"):
+        # type: (str) -> bytes
+        return six.text_type(self._node).encode(encoding)
+
+    def attr(self, key, default=UNDEFINED):  # noqa: ARG002
+        # type: (str, Any) -> Any
+        raise TypeError("Text node selectors do not allow attr method")
+
+    def text(self, smart=False, normalize_space=True):  # noqa: ARG002
+        # type: (bool, bool) -> str
+        if normalize_space:
+            return util.normalize_spaces(cast(str, self._node))
+        return six.text_type(self._node)
+
+
+NODE_METHODS = (
+    "__init__",
+    "attr",
+    "html",
+    "html_bytes",
+    "inner_html",
+    "is_text_node",
+    "select",
+    "text",
+)
+
+
+def make_node_class(cls, methods_class, kind):
+    # type: (type[Any], type[Any], str) -> type[Any]
+    """Create subclass of `cls` with methods of `methods_class`.
+
+    Methods overridden in `cls` or its parents are kept as is. If `cls`
+    does not override the constructor then the constructor of created
+    class switches the class of the selector to other variant if the type
+    of the node does not match the variant. Otherwise the variants use
+    the constructor of `cls` as is and do not check the type of the node.
+    """
+    attrs = {"__slots__": (), "__module__": cls.__module__}  # type: dict[str, Any]
+    for name in NODE_METHODS:
+        if uses_own_method(cls, name):
+            attrs[name] = vars(methods_class)[name]
+    return type("{}[{}]".format(cls.__name__, kind), (cls,), attrs)
+
+
 class XpathSelector(LxmlNodeSelector[LxmlNodeT]):
     __slots__ = ()
 
+    @classmethod
+    def context_xpath(cls, query):
+        # type: (str) -> None | XPath
+        return compile_context_xpath(query)
+
     def process_query(self, query):
         # type: (str) -> Iterable[LxmlNodeT]
-        if query not in XPATH_CACHE:
-            obj = XPath(query, namespaces={"re": REGEXP_NS})
-            XPATH_CACHE[query] = obj
-        xpath_obj = XPATH_CACHE[query]
+        document = self._document
+        if document is not None and document.use_index:
+            found = document.index().lookup(query)
+            if found is not None:
+                # pylint: disable=deprecated-typing-alias
+                return cast(List[LxmlNodeT], found)
+        return self._evaluate(compile_xpath(query))
+
+    def process_first_query(self, query):
+        # type: (str) -> Iterable[LxmlNodeT]
+        document = self._document
+        if document is not None and document.use_index:
+            found = document.index().lookup(query)
+            if found is not None:
+                # pylint: disable=deprecated-typing-alias
+                return cast(List[LxmlNodeT], found[:1])
+        try:
+            return list(islice(self._evaluate(compile_first_xpath(query)), 1))
+        except XPathEvalError:
+            # The query returns not a node-set e.g. number
+            return list(islice(self.process_query(query), 1))
+
+    def select_xpath(self, xpath_obj, lazy=False, first=False):
+        # type: (XPath, bool, bool) -> SelectorList[LxmlNodeT]
+        """Select nodes with precompiled XPath object."""
+        if self.is_text_node():
+            raise TypeError("Text node selectors do not allow select method")
+        profiler = profiling.PROFILER
+        started = profiling.timer() if profiler else 0.0
+        nodes = self._evaluate(xpath_obj)
+        if first:
+            nodes = list(islice(nodes, 1))
+        result = self._wrap_node_list(nodes, xpath_obj.path, lazy=lazy)
+        if profiler is not None:
+            profiler.record(
+                "select_xpath",
+                xpath_obj.path,
+                profiling.timer() - started,
+                None if lazy else len(result),
+            )
+        return result
 
+    def _evaluate(self, xpath_obj):
+        # type: (XPath) -> Iterable[LxmlNodeT]
         result = xpath_obj(cast(_Element, self.node()))
 
         # If you query XPATH like //some/crap/@foo="bar" then xpath function
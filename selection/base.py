@@ -1,8 +1,8 @@
 # from __future__ import annotations
 
 import logging
-import re
 from abc import abstractmethod
+from itertools import islice
 
 import six
 
@@ -14,53 +14,209 @@ except ImportError:
     pass
 
 from types import TracebackType  # pylint: disable=wrong-import-order
-from typing import Any, Generic, TypeVar  # pylint: disable=wrong-import-order
+from typing import (  # pylint: disable=wrong-import-order
+    Any,
+    Callable,
+    Generic,
+    Mapping,
+    TypeVar,
+    cast,
+)
 
 from six.moves.collections_abc import Iterable, Iterator  # pylint: disable=import-error
 
-from . import util
+from . import profiling, util
 from .const import UNDEFINED
+from .document import Document  # pylint: disable=unused-import
 from .errors import SelectionNotFoundError
+from .extract import FieldSpec, extract
+from .profiling import instrument, instrument_class
 
 __all__ = ["RexResultList", "Selector", "SelectorList"]
 LOG = logging.getLogger("selection.base")
 T = TypeVar("T")
+ItemT = TypeVar("ItemT")
+SelectorT = TypeVar("SelectorT", bound="Selector[Any]")
 
 
 class Selector(Generic[T]):
-    __slots__ = ("_node",)
+    __slots__ = ("_document", "_node")
 
-    def __init__(self, node):
-        # type: (T) -> None
+    def __init__(self, node, document=None):
+        # type: (T, None | Document[Any]) -> None
         self._node = node
+        self._document = document
+
+    def _bind(self, document):
+        # type: (SelectorT, None | Document[Any]) -> SelectorT
+        """Set the document of the selector and return the selector.
+
+        It passes the document to selectors of classes which constructor
+        takes only the node, see `takes_document`.
+        """
+        self._document = document
+        return self
 
     def node(self):
         # type: () -> T
         return self._node
 
+    def document(self):
+        # type: () -> None | Document[Any]
+        """Return the document which the node belongs to.
+
+        The document is known if the selector has been created with one
+        of `from_*` constructors, with explicit `document` argument or
+        by `select` method of other selector with known document.
+        """
+        return self._document
+
     @abstractmethod
     def process_query(self, query):
         # type: (str) -> Iterable[T]
         raise NotImplementedError
 
-    def select(self, query):
-        # type: (str) -> SelectorList[T]
-        return self._wrap_node_list(self.process_query(query), query)
+    def process_first_query(self, query):
+        # type: (str) -> Iterable[T]
+        """Return iterable with only first node found by the query.
+
+        Backends could override this method to evaluate the query faster
+        than with `process_query`.
+        """
+        return list(islice(self.process_query(query), 1))
+
+    def select(self, query, lazy=False, first=False):
+        # type: (str, bool, bool) -> SelectorList[T]
+        """Run the query and return list of selectors wrapping found nodes.
+
+        In lazy mode the selectors are created on demand, when items of
+        the result list are accessed, so `one()` or `exists()` do not pay
+        for wrapping all the nodes.
+
+        In first mode the result list contains only the first found node.
+        Use it with `text()`, `attr()`, `one()` and other methods which deal
+        only with first item of selector list.
+        """
+        process = self._query_function(first)
+        if profiling.PROFILER is None:
+            return self._wrap_node_list(process(query), query, lazy=lazy)
+        return self._profiled_select(process, query, lazy)
+
+    def _profiled_select(self, process, query, lazy):
+        # type: (Callable[[str], Iterable[T]], str, bool) -> SelectorList[T]
+        profiler = cast(profiling.Profiler, profiling.PROFILER)
+        started = profiling.timer()
+        result = self._wrap_node_list(process(query), query, lazy=lazy)
+        profiler.record(
+            "select", query, profiling.timer() - started, None if lazy else len(result)
+        )
+        return result
 
-    def _wrap_node_list(self, nodes, query):
-        # type: (Iterable[T], str) -> SelectorList[T]
-        selectors = [self.__class__(x) for x in nodes]
-        return SelectorList(selectors, self.__class__, query)
+    def _query_function(self, first):
+        # type: (bool) -> Callable[[str], Iterable[T]]
+        process = (
+            self.process_first_query if first else self.process_query
+        )  # type: Callable[[str], Iterable[T]]
+        if self._document is not None and self._document.use_memo:
+            return self._memoized(process)
+        return process
+
+    def _memoized(self, process):
+        # type: (Callable[[str], Iterable[T]]) -> Callable[[str], Iterable[T]]
+        """Wrap `process` function to remember its results in the document.
+
+        Results are keyed by the node, the query and the function itself,
+        so selectors of different backends do not share them.
+        """
+        document = cast("Document[T]", self._document)
+        node = self._node
+        func = getattr(process, "__func__", process)
+        return lambda query: document.memo(
+            (node, query, func), lambda: list(process(query))
+        )
+
+    def extract(self, schema):
+        # type: (Mapping[str, FieldSpec]) -> dict[str, Any]
+        """Return dict of values calculated for each field of the schema.
+
+        See `selection.extract` module for the format of the schema.
+        """
+        return extract(self, schema)
+
+    def _wrap_node_list(self, nodes, query, lazy=False):
+        # type: (Iterable[T], str, bool) -> SelectorList[T]
+        cls = self.__class__
+        document = self._document
+        if not takes_document(cls):
+            # pylint: disable-next=protected-access
+            selectors = (cls(x)._bind(document) for x in nodes)  # noqa: SLF001
+            return SelectorList(selectors if lazy else list(selectors), cls, query)
+        if lazy:
+            return SelectorList((cls(x, document) for x in nodes), cls, query)
+        return SelectorList([cls(x, document) for x in nodes], cls, query)
 
     def is_text_node(self):
         # type: ()-> bool
         raise NotImplementedError
 
+    @classmethod
+    def select_all(cls, selectors, query, dedupe=False):
+        # type: (list[Selector[T]], str, bool) -> SelectorList[T]
+        """Run the query for each selector and return list of all found nodes.
+
+        If `dedupe` is True then each node is included in the result only
+        once. Backends could override it to evaluate the query for all
+        selectors at once.
+        """
+        items = []  # type: list[Selector[T]]
+        for selector in selectors:
+            items.extend(selector.select(query))
+        if dedupe:
+            seen = set()  # type: set[int]
+            unique_items = []
+            for item in items:
+                # Nodes are alive while `items` list exists, so their ids
+                # are unique
+                key = id(item.node())
+                if key not in seen:
+                    seen.add(key)
+                    unique_items.append(item)
+            items = unique_items
+        return SelectorList(items, cls, query)
+
+    @classmethod
+    def text_batch(cls, nodes, smart=False, normalize_space=True):
+        # type: (Iterable[T], bool, bool) -> list[str]
+        """Return list of `text()` results calculated for each node.
+
+        Backends could override it to process nodes without creating
+        selector for each node.
+        """
+        return [
+            cls(x).text(smart=smart, normalize_space=normalize_space) for x in nodes
+        ]
+
+    @classmethod
+    def attr_batch(cls, nodes, key, default=UNDEFINED):
+        # type: (Iterable[T], str, Any) -> list[Any]
+        """Return list of `attr()` results calculated for each node."""
+        return [cls(x).attr(key, default=default) for x in nodes]
+
     @abstractmethod
     def html(self):
         # type: () -> str
         raise NotImplementedError
 
+    def inner_html(self):
+        # type: () -> str
+        """Return HTML of the node content without the node tags."""
+        return "".join(item.html() for item in self.select("./*"))
+
+    def html_bytes(self, encoding="utf-8"):
+        # type: (str) -> bytes
+        """Return HTML of the node encoded into bytes."""
+        return self.html().encode(encoding)
+
     def attr(self, key, default=UNDEFINED):
         # type: (str, Any) -> Any
         raise NotImplementedError
@@ -86,30 +242,153 @@ class Selector(Generic[T]):
                 raise
             return default
 
-    def rex(self, regexp, flags=0):  # pylint: disable=used-before-assignment
-        # type: (bytes|str|Pattern[str], int) -> RexResultList
-        if isinstance(regexp, six.binary_type):
-            regexp = regexp.decode("utf-8")
-        if isinstance(regexp, six.text_type):
-            regexp = re.compile(regexp, flags)
-        matches = list(regexp.finditer(self.html()))
-        return RexResultList(matches, source_rex=regexp)
+    def rex(
+        self,
+        regexp,  # type: bytes | str | Pattern[str]
+        flags=0,  # type: int
+        source=False,  # type: bool
+    ):
+        # type: (...) -> RexResultList
+        """Find all matches of regular expression in HTML of the node.
+
+        :param source: match against the original source of the document
+            instead of serialized node; it works only for the selector of
+            root node created by `from_bytes` or `from_string` constructor
+            with `keep_source=True`
+        """
+        regexp = util.compile_regexp(regexp, flags)
+        text = self.source_text() if source else self.html()
+        return RexResultList(regexp.finditer(text), source_rex=regexp)
+
+    def source_text(self):
+        # type: () -> str
+        """Return original source of the document of the root node."""
+        document = self._document
+        text = None
+        if document is not None and document.root is self._node:
+            text = document.source_text()
+        if text is None:
+            raise ValueError(
+                "Original source is available only for root node"
+                " of document created by from_bytes or from_string"
+                " with keep_source=True"
+            )
+        return text
+
+
+class LazyList(Generic[ItemT]):
+    """Base class of lists which could pull items lazily.
+
+    If `items` is not a list but any other iterable then items are pulled
+    from the iterable only when they are needed and then are remembered.
+    """
+
+    __slots__ = ("_items", "_source")
+
+    def __init__(self, items):
+        # type: (Iterable[ItemT]) -> None
+        if isinstance(items, list):
+            self._items = items  # type: list[ItemT]
+            self._source = None  # type: None | Iterator[ItemT]
+        else:
+            self._items = []
+            self._source = iter(items)
+
+    def _set_items(self, items):
+        # type: (Iterable[ItemT]) -> None
+        """Replace all items of the list."""
+        LazyList.__init__(self, items)
+
+    def _all_items(self):
+        # type: () -> list[ItemT]
+        if self._source is not None:
+            self._items.extend(self._source)
+            self._source = None
+        return self._items
+
+    def _fetch(self, size):
+        # type: (int) -> bool
+        """Pull items from lazy source until there are `size` items.
+
+        Return False if the list has less than `size` items.
+        """
+        items = self._items
+        while len(items) < size:
+            if self._source is None:
+                return False
+            try:
+                items.append(next(self._source))
+            except StopIteration:
+                self._source = None
+                return False
+        return True
+
+    def __getitem__(self, index):
+        # type: (int) -> ItemT
+        if isinstance(index, int) and index >= 0:
+            self._fetch(index + 1)
+            return self._items[index]
+        return self._all_items()[index]
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._all_items())
+
+    def __iter__(self):
+        # type: () -> Iterator[ItemT]
+        if self._source is None:
+            return iter(self._items)
+        return self._iter_lazy()
+
+    def _iter_lazy(self):
+        # type: () -> Iterator[ItemT]
+        idx = 0
+        while self._fetch(idx + 1):
+            yield self._items[idx]
+            idx += 1
 
 
-class SelectorList(Generic[T]):
-    __slots__ = ("origin_query", "origin_selector_class", "selector_list")
+def takes_document(cls):
+    # type: (type[Any]) -> bool
+    """Check that the selector class does not override the constructor.
+
+    Subclasses could override it with `__init__(self, node)` signature,
+    so the document is passed to their selectors with `_bind` method.
+    """
+    return six.get_unbound_function(cls.__init__) is vars(Selector)["__init__"]
+
+
+@instrument_class
+class SelectorList(LazyList[Selector[T]]):
+    """List of selectors.
+
+    If `selector_list` is not a list but any other iterable then
+    the selector list is lazy, see `LazyList`.
+    """
+
+    __slots__ = ("origin_query", "origin_selector_class")
 
     def __init__(
         self,
-        selector_list,  # type: list[Selector[T]]
+        selector_list,  # type: Iterable[Selector[T]]
         origin_selector_class,  # type: type[Selector[T]]
         origin_query,  # type: str
     ):
         # type: (...) -> None
-        self.selector_list = selector_list
+        super(SelectorList, self).__init__(selector_list)  # noqa: UP008
         self.origin_selector_class = origin_selector_class
         self.origin_query = origin_query
 
+    @property
+    def selector_list(self):
+        # type: () -> list[Selector[T]]
+        return self._all_items()
+
+    @selector_list.setter
+    def selector_list(self, items):
+        # type: (Iterable[Selector[T]]) -> None
+        self._set_items(items)
+
     def __enter__(self):
         # type: () -> SelectorList[T]
         return self
@@ -118,17 +397,15 @@ class SelectorList(Generic[T]):
         # type: (type[Exception], Exception, TracebackType) -> None
         pass
 
-    def __getitem__(self, index):
-        # type: (int) -> Selector[T]
-        return self.selector_list[index]
-
     def __len__(self):
         # type: () -> int
         return self.count()
 
-    def __iter__(self):
-        # type: () -> Iterator[Selector[T]]
-        return iter(self.selector_list)
+    def __bool__(self):
+        # type: () -> bool
+        return self.exists()
+
+    __nonzero__ = __bool__
 
     def count(self):
         # type: () -> int
@@ -136,17 +413,16 @@ class SelectorList(Generic[T]):
 
     def one(self, default=UNDEFINED):
         # type: (Any) -> Any
-        try:
-            return self.selector_list[0]
-        except IndexError:  # as ex:
-            if default is UNDEFINED:
-                raise SelectionNotFoundError(
-                    "Could not get first item for {} query of class {}".format(
-                        self.origin_query,
-                        self.origin_selector_class.__name__,
-                    )
-                )  # from ex
-            return default
+        if self._fetch(1):
+            return self._items[0]
+        if default is UNDEFINED:
+            raise SelectionNotFoundError(
+                "Could not get first item for {} query of class {}".format(
+                    self.origin_query,
+                    self.origin_selector_class.__name__,
+                )
+            )
+        return default
 
     def node(self, default=UNDEFINED):
         # type: (Any) -> Any
@@ -162,6 +438,7 @@ class SelectorList(Generic[T]):
                 )  # from ex
             return default
 
+    @instrument("text")
     def text(
         self,
         default=UNDEFINED,  # type: Any
@@ -177,13 +454,14 @@ class SelectorList(Generic[T]):
             return default
         return sel.text(smart=smart, normalize_space=normalize_space)
 
+    @instrument("text_list")
     def text_list(self, smart=False, normalize_space=True):
         # type: (bool, bool) -> list[str]
-        result_list = []
-        for item in self.selector_list:
-            result_list.append(item.text(normalize_space=normalize_space, smart=smart))
-        return result_list
+        return self.origin_selector_class.text_batch(
+            self._node_list(), smart=smart, normalize_space=normalize_space
+        )
 
+    @instrument("html")
     def html(self, default=UNDEFINED):
         # type: (Any) -> Any
         try:
@@ -194,6 +472,7 @@ class SelectorList(Generic[T]):
             return default
         return sel.html()
 
+    @instrument("inner_html")
     def inner_html(self, default=UNDEFINED):
         # type: (Any) -> Any
         try:
@@ -202,9 +481,20 @@ class SelectorList(Generic[T]):
             if default is UNDEFINED:
                 raise
             return default
-        result_list = [item.html() for item in sel.select("./*")]
-        return "".join(result_list).strip()
+        return sel.inner_html().strip()
+
+    @instrument("html_bytes")
+    def html_bytes(self, default=UNDEFINED, encoding="utf-8"):
+        # type: (Any, str) -> Any
+        try:
+            sel = self.one()
+        except SelectionNotFoundError:
+            if default is UNDEFINED:
+                raise
+            return default
+        return sel.html_bytes(encoding=encoding)
 
+    @instrument("number")
     def number(
         self,
         default=UNDEFINED,  # type: Any
@@ -227,10 +517,11 @@ class SelectorList(Generic[T]):
             make_int=make_int,
         )
 
+    @instrument("exists")
     def exists(self):
         # type: () -> bool
         """Return True if selector list is not empty."""
-        return len(self.selector_list) > 0
+        return self._fetch(1)
 
     def require(self):
         # type: () -> None
@@ -243,6 +534,7 @@ class SelectorList(Generic[T]):
                 )
             )
 
+    @instrument("attr")
     def attr(self, key, default=UNDEFINED):
         # type: (str, Any) -> Any
         try:
@@ -253,49 +545,83 @@ class SelectorList(Generic[T]):
             return default
         return sel.attr(key, default=default)
 
+    @instrument("attr_list")
     def attr_list(self, key, default=UNDEFINED):
         # type: (str, Any) -> Any
-        result_list = []
-        for item in self.selector_list:
-            result_list.append(item.attr(key, default=default))
-        return result_list
+        return self.origin_selector_class.attr_batch(
+            self._node_list(), key, default=default
+        )
 
-    def rex(self, regexp, flags=0, default=UNDEFINED):
-        # type: (Pattern[str], int, Any) -> Any
+    @instrument("rex")
+    def rex(self, regexp, flags=0, default=UNDEFINED, source=False):
+        # type: (Pattern[str], int, Any, bool) -> Any
         try:
             sel = self.one()
         except SelectionNotFoundError:
             if default is UNDEFINED:
                 raise
             return default
-        return sel.rex(regexp, flags=flags)
+        return sel.rex(regexp, flags=flags, source=source)
 
+    @instrument("node_list")
     def node_list(self):
         # type: () -> list[Any]
-        return [x.node() for x in self.selector_list]
+        return self._node_list()
 
-    def select(self, query):
-        # type: (str) -> SelectorList[T]
-        result = SelectorList(
-            [], self.origin_selector_class, self.origin_query + " + " + query
+    def _node_list(self):
+        # type: () -> list[Any]
+        return [x.node() for x in self]
+
+    def select(self, query, dedupe=False):
+        # type: (str, bool) -> SelectorList[T]
+        """Run the query for each selector of the list and join results.
+
+        :param dedupe: include each found node only once; with lxml
+            backends a relative query is then evaluated for all selectors
+            in one go and found nodes are returned in document order
+        """
+        profiler = profiling.PROFILER
+        started = profiling.timer() if profiler else 0.0
+        result = self.origin_selector_class.select_all(
+            self.selector_list, query, dedupe=dedupe
         )
-        for selector in self.selector_list:
-            result.selector_list.extend(iter(selector.select(query)))
+        if profiler is not None:
+            profiler.record(
+                "select_all", query, profiling.timer() - started, len(result)
+            )
+        result.origin_query = self.origin_query + " + " + query
         return result
 
 
-class RexResultList:
-    __slots__ = ("items", "source_rex")
+class RexResultList(LazyList["Match[str]"]):
+    """List of regular expression matches.
+
+    If `items` is not a list but any other iterable then matches are pulled
+    from it only when they are needed, so `one()`, `text()` and `number()`
+    stop searching after the first match.
+    """
+
+    __slots__ = ("source_rex",)
 
     def __init__(self, items, source_rex):
-        # type: (list[Match[str]], Pattern[str]) -> None
-        self.items = items
+        # type: (Iterable[Match[str]], Pattern[str]) -> None
+        super(RexResultList, self).__init__(items)  # noqa: UP008
         self.source_rex = source_rex
 
+    @property
+    def items(self):
+        # type: () -> list[Match[str]]
+        return self._all_items()
+
+    @items.setter
+    def items(self, items):
+        # type: (Iterable[Match[str]]) -> None
+        self._set_items(items)
+
     def one(self):
         # type: () -> Match[str]
         try:
-            return self.items[0]
+            return self[0]
         except IndexError:
             raise SelectionNotFoundError
 
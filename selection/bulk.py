@@ -0,0 +1,215 @@
+"""Extraction of data from many documents in parallel processes or threads."""
+# from __future__ import annotations
+
+import multiprocessing
+from collections import deque
+from itertools import islice
+from typing import Any, Iterable, Iterator, cast
+
+try:
+    from concurrent.futures import (
+        FIRST_COMPLETED,
+        Executor,
+        Future,
+        ProcessPoolExecutor,
+        ThreadPoolExecutor,
+        wait,
+    )
+except ImportError:  # pragma: no cover
+    # python 2.7 without "futures" package installed
+    ProcessPoolExecutor = None  # type: ignore[assignment,misc]
+
+from .plan import ExtractionPlan
+from .util import PARSER_TYPES, parse_document
+
+__all__ = ["extract_many"]
+PARSERS = PARSER_TYPES
+MODES = ("process", "thread")
+# Plan of worker process set by `init_worker`
+WORKER_PLAN = None  # type: None | ExtractionPlan
+
+
+def init_worker(plan):
+    # type: (ExtractionPlan) -> None
+    """Store the plan in worker process, so tasks do not need to carry it."""
+    global WORKER_PLAN  # noqa: PLW0603 pylint: disable=global-statement
+    WORKER_PLAN = plan
+
+
+def extract_chunk(documents, parser="html", plan=None):
+    # type: (list[bytes | str], str, None | ExtractionPlan) -> list[dict[str, Any]]
+    """Apply extraction plan to each document of the chunk.
+
+    This function is executed in worker process. If `plan` is None then
+    the plan stored by `init_worker` is used.
+    """
+    if plan is None:
+        plan = cast(ExtractionPlan, WORKER_PLAN)
+    return [plan.apply(parse_document(data, parser=parser)) for data in documents]
+
+
+def iter_chunks(items, size):
+    # type: (Iterable[Any], int) -> Iterator[tuple[int, list[Any]]]
+    """Split items into lists of `size` items.
+
+    Yield (index of first item of chunk, chunk) tuples.
+    """
+    items = iter(items)
+    start = 0
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield start, chunk
+        start += len(chunk)
+
+
+def extract_many(  # noqa: PLR0913, PLR0917 pylint: disable=too-many-arguments
+    documents,  # type: Iterable[bytes | str]
+    plan,  # type: ExtractionPlan
+    workers=None,  # type: None | int
+    chunksize=10,  # type: int
+    ordered=True,  # type: bool
+    max_pending=None,  # type: None | int
+    parser="html",  # type: str
+    with_index=False,  # type: bool
+    executor=None,  # type: None | Executor
+    mode="process",  # type: str
+):
+    # type: (...) -> Iterator[Any]
+    """Parse documents and apply extraction plan to them in worker processes.
+
+    Return iterator over results of `plan.apply` for each document.
+
+    :param workers: number of workers, by default number of CPUs;
+        zero means processing documents in current thread
+    :param chunksize: number of documents sent to worker in one task
+    :param ordered: if False then results are yielded in order of completion
+    :param max_pending: max number of chunks sent to workers and not yet
+        consumed by the caller, by default `2 * workers`; documents are read
+        from `documents` iterable only when there is room for new chunk
+    :param parser: "html" or "xml"
+    :param with_index: yield (index of document, result) tuples
+    :param executor: existing executor to use instead of new pool
+    :param mode: "process" to use pool of processes or "thread" to use pool
+        of threads; lxml releases GIL while parsing documents and evaluating
+        XPath queries, so threads could run in parallel without the cost
+        of sending documents and results between processes
+    """
+    if parser not in PARSERS:
+        raise ValueError("Invalid parser: {}".format(parser))
+    if mode not in MODES:
+        raise ValueError("Invalid mode: {}".format(mode))
+    if chunksize < 1:
+        raise ValueError("Option chunksize must be a positive number")
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if max_pending is None:
+        max_pending = 2 * max(workers, 1)
+    chunks = iter_chunks(documents, chunksize)
+    if executor is not None:
+        results = iter_executor_results(
+            executor, chunks, plan, parser, max_pending, ordered
+        )
+    elif workers == 0:
+        results = iter_local_results(chunks, plan, parser)
+    else:
+        results = iter_pool_results(
+            mode, workers, chunks, plan, parser, max_pending, ordered
+        )
+    if with_index:
+        return results
+    return (res for _, res in results)
+
+
+def iter_local_results(chunks, plan, parser):
+    # type: (Iterator[tuple[int, list[Any]]], ExtractionPlan, str) -> Iterator[Any]
+    for start, chunk in chunks:
+        for offset, res in enumerate(extract_chunk(chunk, parser, plan)):
+            yield start + offset, res
+
+
+def iter_pool_results(  # noqa: PLR0913
+    mode,  # type: str
+    workers,  # type: int
+    chunks,  # type: Iterator[tuple[int, list[Any]]]
+    plan,  # type: ExtractionPlan
+    parser,  # type: str
+    max_pending,  # type: int
+    ordered,  # type: bool
+):
+    # type: (...) -> Iterator[Any]
+    if ProcessPoolExecutor is None:  # pragma: no cover
+        raise ImportError("Package futures is required to run extract_many")
+    if mode == "thread":
+        pool = ThreadPoolExecutor(workers)  # type: Executor
+        task_plan = plan  # type: None | ExtractionPlan
+    else:
+        try:
+            # Send the plan to each worker once
+            pool = ProcessPoolExecutor(
+                workers, initializer=init_worker, initargs=(plan,)
+            )
+            task_plan = None
+        except TypeError:  # pragma: no cover
+            # Executor of python 2.7 "futures" package has no initializer,
+            # the plan is sent with each chunk and is compiled once per
+            # worker thanks to the cache of unpickled plans
+            pool = ProcessPoolExecutor(workers)
+            task_plan = plan
+    with pool:
+        # py27 does not support "yield from"
+        # pylint: disable=use-yield-from
+        for item in iter_executor_results(  # noqa: UP028
+            pool, chunks, task_plan, parser, max_pending, ordered
+        ):
+            yield item
+
+
+def iter_executor_results(  # noqa: PLR0913
+    executor,  # type: Executor
+    chunks,  # type: Iterator[tuple[int, list[Any]]]
+    plan,  # type: None | ExtractionPlan
+    parser,  # type: str
+    max_pending,  # type: int
+    ordered,  # type: bool
+):
+    # type: (...) -> Iterator[Any]
+    """Submit chunks to executor and yield (index, result) tuples.
+
+    No more than `max_pending` chunks are submitted and not consumed
+    at any moment. Chunks which are not started yet are cancelled if
+    the caller stops the iteration. The `plan` of None means workers
+    have got the plan from `init_worker`.
+    """
+    pending = deque()  # type: deque[tuple[int, Future[list[dict[str, Any]]]]]
+
+    def fill():
+        # type: () -> None
+        while len(pending) < max_pending:
+            try:
+                start, chunk = next(chunks)
+            except StopIteration:
+                return
+            pending.append(
+                (start, executor.submit(extract_chunk, chunk, parser, plan))
+            )
+
+    try:
+        fill()
+        while pending:
+            if ordered:
+                start, future = pending.popleft()
+            else:
+                done = wait([x[1] for x in pending], return_when=FIRST_COMPLETED)[0]
+                # Earliest chunk among completed ones
+                item = min((x for x in pending if x[1] in done), key=lambda x: x[0])
+                pending.remove(item)
+                start, future = item
+            results = future.result()
+            fill()
+            for offset, res in enumerate(results):
+                yield start + offset, res
+    finally:
+        for _, future in pending:
+            future.cancel()
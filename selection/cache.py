@@ -0,0 +1,215 @@
+# from __future__ import annotations
+
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, TypeVar, cast
+
+__all__ = ["LruCache", "ThreadLocalCache"]
+ValueT = TypeVar("ValueT")
+
+
+class LruCache(Generic[ValueT]):
+    """Thread-safe mapping with a size limit and least-recently-used eviction.
+
+    The `maxsize` of None means the cache is not limited. The maxsize of zero
+    disables caching: every lookup is a miss and nothing is stored.
+    """
+
+    def __init__(self, maxsize=None):
+        # type: (None | int) -> None
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("Cache maxsize must be a non-negative number or None")
+        self._maxsize = maxsize
+        self._data = OrderedDict()  # type: OrderedDict[Hashable, ValueT]
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def maxsize(self):
+        # type: () -> None | int
+        return self._maxsize
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._data)
+
+    def __contains__(self, key):
+        # type: (Hashable) -> bool
+        return key in self._data
+
+    def get(self, key, default=None):
+        # type: (Hashable, Any) -> Any
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        # type: (Hashable, ValueT) -> None
+        with self._lock:
+            self._data.pop(key, None)
+            if self._maxsize == 0:
+                return
+            self._data[key] = value
+            self._evict(self._maxsize)
+
+    def get_or_create(self, key, factory):
+        # type: (Hashable, Callable[[], ValueT]) -> ValueT
+        """Return cached value or build it with `factory` and store it."""
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                self._data[key] = value
+                self.hits += 1
+                return value
+        # Build the value outside of the lock, factory could be slow
+        value = factory()
+        self.set(key, value)
+        return value
+
+    def resize(self, maxsize):
+        # type: (None | int) -> None
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("Cache maxsize must be a non-negative number or None")
+        with self._lock:
+            self._maxsize = maxsize
+            self._evict(maxsize)
+
+    def clear(self):
+        # type: () -> None
+        with self._lock:
+            self._data.clear()
+
+    def reset_stats(self):
+        # type: () -> None
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        # type: () -> dict[str, Any]
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._data),
+                "maxsize": self._maxsize,
+            }
+
+    def _evict(self, maxsize):
+        # type: (None | int) -> None
+        if maxsize is None:
+            return
+        while len(self._data) > maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+class ThreadLocalCache(Generic[ValueT]):
+    """Cache which keeps separate `LruCache` for each thread.
+
+    Use it for objects which must not be shared between threads, e.g.
+    lxml XPath objects: evaluation of XPath object is guarded by its
+    internal lock, so threads sharing the object wait for each other.
+    The `maxsize` limit is applied to the cache of each thread.
+    """
+
+    def __init__(self, maxsize=None):
+        # type: (None | int) -> None
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("Cache maxsize must be a non-negative number or None")
+        self._maxsize = maxsize
+        self._local = threading.local()
+        self._caches = weakref.WeakSet()  # type: weakref.WeakSet[LruCache[ValueT]]
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        # type: () -> None | int
+        return self._maxsize
+
+    def thread_cache(self):
+        # type: () -> LruCache[ValueT]
+        """Return cache of current thread."""
+        try:
+            return cast(LruCache[ValueT], self._local.cache)
+        except AttributeError:
+            cache = LruCache(self._maxsize)  # type: LruCache[ValueT]
+            self._local.cache = cache
+            with self._lock:
+                self._caches.add(cache)
+            return cache
+
+    def _all_caches(self):
+        # type: () -> list[LruCache[ValueT]]
+        with self._lock:
+            return list(self._caches)
+
+    def __len__(self):
+        # type: () -> int
+        return len(self.thread_cache())
+
+    def __contains__(self, key):
+        # type: (Hashable) -> bool
+        return key in self.thread_cache()
+
+    def get(self, key, default=None):
+        # type: (Hashable, Any) -> Any
+        return self.thread_cache().get(key, default)
+
+    def set(self, key, value):
+        # type: (Hashable, ValueT) -> None
+        self.thread_cache().set(key, value)
+
+    def get_or_create(self, key, factory):
+        # type: (Hashable, Callable[[], ValueT]) -> ValueT
+        return self.thread_cache().get_or_create(key, factory)
+
+    def resize(self, maxsize):
+        # type: (None | int) -> None
+        if maxsize is not None and maxsize < 0:
+            raise ValueError("Cache maxsize must be a non-negative number or None")
+        self._maxsize = maxsize
+        for cache in self._all_caches():
+            cache.resize(maxsize)
+
+    def clear(self):
+        # type: () -> None
+        for cache in self._all_caches():
+            cache.clear()
+
+    def reset_stats(self):
+        # type: () -> None
+        for cache in self._all_caches():
+            cache.reset_stats()
+
+    def stats(self):
+        # type: () -> dict[str, Any]
+        """Return stats summed over caches of all live threads."""
+        result = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "size": 0,
+            "maxsize": self._maxsize,
+            "threads": 0,
+        }  # type: dict[str, Any]
+        for cache in self._all_caches():
+            for key, val in cache.stats().items():
+                if key != "maxsize":
+                    result[key] += val
+            result["threads"] += 1
+        return result
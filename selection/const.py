@@ -1 +1,14 @@
-UNDEFINED = object()
+class Undefined(object):  # noqa: UP004
+    __slots__ = ()
+
+    def __repr__(self):
+        # type: () -> str
+        return "UNDEFINED"
+
+    def __reduce__(self):
+        # type: () -> str
+        # Unpickled value must be the same UNDEFINED object
+        return "UNDEFINED"
+
+
+UNDEFINED = Undefined()
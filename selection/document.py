@@ -0,0 +1,173 @@
+"""Context shared by all selectors created from one parsed document."""
+# from __future__ import annotations
+
+from typing import Any, Callable, Generic, Hashable, TypeVar, cast
+
+import six
+
+from .cache import LruCache
+from .index import DocumentIndex
+
+__all__ = ["Document"]
+MEMO_MAX_NODES = 1000
+NodeT = TypeVar("NodeT")
+
+
+class Document(Generic[NodeT]):  # pylint: disable=too-many-instance-attributes
+    """Parsed document: its root node, original source and caches.
+
+    The document is created by `from_bytes`, `from_string`, `from_file`
+    and `from_mmap` constructors of selector and is passed from selector
+    to selectors created by its `select` calls. The selector created
+    directly from the node has no document unless it is passed explicitly:
+    `XpathSelector(node, Document(node))`.
+
+    With non-zero `html_cache_size` serialized HTML of nodes is cached, so
+    repeated `html()` and `rex()` calls do not serialize the same subtree
+    again. The cache does not know about changes of the DOM tree: call
+    `invalidate()` after modifying it.
+
+    With `use_index=True` the `XpathSelector` answers simple document-wide
+    queries like `//a` or `//*[@id="x"]` from `DocumentIndex` which is
+    built on the first such query. Building the index costs several full
+    scans of the tree, so enable it for documents which are queried many
+    times.
+
+    With non-zero `memo_size` the nodes found by `select(query)` are
+    remembered for each (node, query, backend) and the same query on the
+    same node returns them without evaluating the query again. At most
+    `memo_size` results are kept, results longer than `memo_max_nodes`
+    are not kept at all. The memo does not know about changes of the tree
+    too: call `invalidate()` after modifying it.
+
+    :param root: root node of the document
+    :param source: original content of the document, it is used by
+        `rex(..., source=True)` of the root selector
+    :param encoding: encoding of `source` if it is bytes; by default the
+        encoding detected by lxml is used
+    :param html_cache_size: max number of nodes which HTML is cached,
+        zero disables the cache, None means no limit
+    :param use_index: answer simple queries from the index of elements
+    :param memo_size: max number of remembered query results, zero disables
+        the memo, None means no limit
+    :param memo_max_nodes: max number of nodes in remembered result
+    """
+
+    __slots__ = (
+        "_html_cache",
+        "_index",
+        "_memo",
+        "_source_text",
+        "encoding",
+        "memo_max_nodes",
+        "root",
+        "source",
+        "use_index",
+        "use_memo",
+    )
+
+    def __init__(
+        self,
+        root,  # type: NodeT
+        source=None,  # type: None | bytes | str
+        encoding=None,  # type: None | str
+        html_cache_size=0,  # type: None | int
+        use_index=False,  # type: bool
+        memo_size=0,  # type: None | int
+        memo_max_nodes=MEMO_MAX_NODES,  # type: int
+    ):
+        # type: (...) -> None
+        self.root = root
+        self.source = source
+        self.encoding = encoding
+        self.use_index = use_index
+        self.use_memo = memo_size != 0
+        self.memo_max_nodes = memo_max_nodes
+        self._html_cache = (
+            None if html_cache_size == 0 else LruCache(maxsize=html_cache_size)
+        )  # type: None | LruCache[str]
+        self._memo = (
+            None if memo_size == 0 else LruCache(maxsize=memo_size)
+        )  # type: None | LruCache[list[Any]]
+        self._source_text = None  # type: None | str
+        self._index = None  # type: None | DocumentIndex
+
+    def html(self, node, render):
+        # type: (NodeT, Callable[[NodeT], str]) -> str
+        """Return HTML of the node rendered by `render` function or cached."""
+        if self._html_cache is None:
+            return render(node)
+        return self._html_cache.get_or_create(node, lambda: render(node))
+
+    def memo(self, key, compute):
+        # type: (Hashable, Callable[[], list[Any]]) -> list[Any]
+        """Return remembered result of the query or compute it.
+
+        The `key` identifies the node, the query and the backend. Do not
+        modify returned list.
+        """
+        memo = self._memo
+        if memo is None:
+            return compute()
+        result = memo.get(key)  # type: None | list[Any]
+        if result is None:
+            result = compute()
+            if len(result) <= self.memo_max_nodes:
+                memo.set(key, result)
+        return result
+
+    def source_text(self):
+        # type: () -> None | str
+        """Return original source of the document decoded to unicode.
+
+        Return None if document has been created without source.
+        """
+        if self.source is None or isinstance(self.source, six.text_type):
+            return self.source
+        if self._source_text is None:
+            encoding = self.encoding or self.detected_encoding() or "utf-8"
+            try:
+                self._source_text = self.source.decode(encoding, "replace")
+            except LookupError:
+                # Unknown encoding declared in the document
+                self._source_text = self.source.decode("utf-8", "replace")
+        return self._source_text
+
+    def index(self):
+        # type: () -> DocumentIndex
+        """Return index of elements of the document, build it if needed.
+
+        The index is available even if `use_index` is off.
+        """
+        if self._index is None:
+            self._index = DocumentIndex(cast(Any, self.root))
+        return self._index
+
+    def detected_encoding(self):
+        # type: () -> None | str
+        try:
+            return cast(str, cast(Any, self.root).getroottree().docinfo.encoding)
+        except AttributeError:
+            return None
+
+    def invalidate(self):
+        # type: () -> None
+        """Drop cached data calculated from the DOM tree.
+
+        Call it after modifying the tree.
+        """
+        if self._html_cache is not None:
+            self._html_cache.clear()
+        self._index = None
+        if self._memo is not None:
+            self._memo.clear()
+
+    def cache_stats(self):
+        # type: () -> None | dict[str, int | None]
+        """Return stats of the HTML cache or None if it is disabled."""
+        return None if self._html_cache is None else self._html_cache.stats()
+
+    def memo_stats(self):
+        # type: () -> None | dict[str, int | None]
+        """Return stats of the memo or None if it is disabled."""
+        return None if self._memo is None else self._memo.stats()
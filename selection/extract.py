@@ -0,0 +1,178 @@
+r"""Extraction of multiple named values from the document in one call.
+
+The schema is a mapping of field name to field specification. The field
+specification could be:
+
+* query string, the value is text of first found node
+* tuple (query, accessor) or (query, accessor, default)
+* `Field` instance
+
+The accessor is a name of `SelectorList` method which calculates the value:
+text, html, inner_html, node, number, attr, rex, exists, count, text_list,
+attr_list, node_list. The "list" is an alias for "text_list". Arguments of
+the accessor could be passed with a tuple e.g. ("attr", "href") or
+("rex", r"id=(\d+)").
+"""
+# from __future__ import annotations
+
+from operator import methodcaller
+from typing import Any, Callable, Mapping, Tuple, Union
+
+import six
+
+from .const import UNDEFINED
+from .errors import SelectionNotFoundError
+from .util import compile_regexp
+
+__all__ = ["Field", "extract", "parse_schema"]
+# Accessors which use only first item of selector list
+SCALAR_ACCESSORS = {
+    "attr",
+    "exists",
+    "html",
+    "inner_html",
+    "node",
+    "number",
+    "rex",
+    "text",
+}
+# Accessors which use all items of selector list
+LIST_ACCESSORS = {"attr_list", "count", "node_list", "text_list"}
+# Accessors which do not accept `default` argument
+NO_DEFAULT_ACCESSORS = {"count", "exists", "node_list", "text_list"}
+ACCESSOR_ALIASES = {"list": "text_list"}
+# Min and max number of positional arguments of accessors, other
+# accessors do not accept positional arguments
+ACCESSOR_ARGS = {
+    "attr": (1, 1),
+    "attr_list": (1, 1),
+    "rex": (1, 2),
+    "text_list": (0, 2),
+}
+# pylint: disable=deprecated-typing-alias,consider-alternative-union-syntax
+FieldSpec = Union[str, Tuple[Any, ...], "Field"]
+
+
+class Field(object):  # noqa: UP004
+    __slots__ = ("accessor", "args", "default", "options", "query")
+
+    def __init__(
+        self,
+        query,  # type: str
+        accessor="text",  # type: str | tuple[Any, ...]
+        default=UNDEFINED,  # type: Any
+        **options  # type: Any
+    ):
+        # type: (...) -> None
+        if isinstance(accessor, six.string_types):
+            name, args = accessor, ()  # type: str, tuple[Any, ...]
+        else:
+            name, args = accessor[0], tuple(accessor[1:])
+        name = ACCESSOR_ALIASES.get(name, name)
+        if name not in SCALAR_ACCESSORS and name not in LIST_ACCESSORS:
+            raise ValueError("Unknown accessor: {}".format(name))
+        min_args, max_args = ACCESSOR_ARGS.get(name, (0, 0))
+        if not min_args <= len(args) <= max_args:
+            raise ValueError(
+                "Invalid arguments of accessor {}: {!r}".format(name, args)
+            )
+        self.query = query
+        self.accessor = name
+        self.args = args
+        self.default = default
+        self.options = options
+
+    def __repr__(self):
+        # type: () -> str
+        return "<Field {!r} {}>".format(self.query, self.accessor)
+
+    def __getstate__(self):
+        # type: () -> tuple[Any, ...]
+        return (self.query, self.accessor, self.args, self.default, self.options)
+
+    def __setstate__(self, state):
+        # type: (tuple[Any, ...]) -> None
+        (self.query, self.accessor, self.args, self.default, self.options) = state
+
+    def needs_all_items(self):
+        # type: () -> bool
+        return self.accessor in LIST_ACCESSORS
+
+    def make_accessor(self):
+        # type: () -> Callable[[Any], Any]
+        """Return function which calculates field value from selector list.
+
+        The arguments and the regular expression of "rex" accessor are
+        prepared once, when the function is built. The method is looked up
+        on the selector list at each call, so the function uses methods
+        which profiling installs while it is enabled.
+        """
+        args, options, default = self.args, self.options, self.default
+        if self.accessor in NO_DEFAULT_ACCESSORS:
+            return methodcaller(self.accessor, *args, **options)
+        if self.accessor == "rex":
+            options = dict(options)
+            flags = options.pop("flags", args[1] if len(args) > 1 else 0)
+            method = methodcaller("rex", compile_regexp(args[0], flags), **options)
+
+            def rex_accessor(sel_list):
+                # type: (Any) -> Any
+                try:
+                    return method(sel_list).text()
+                except SelectionNotFoundError:
+                    if default is UNDEFINED:
+                        raise
+                    return default
+
+            return rex_accessor
+        return methodcaller(self.accessor, *args, default=default, **options)
+
+    def apply(self, sel_list):
+        # type: (Any) -> Any
+        """Calculate field value from the selector list."""
+        return self.make_accessor()(sel_list)
+
+
+def make_field(spec):
+    # type: (FieldSpec) -> Field
+    if isinstance(spec, Field):
+        return spec
+    if isinstance(spec, six.string_types):
+        return Field(spec)
+    if isinstance(spec, tuple) and 1 <= len(spec) <= 3:  # noqa: PLR2004
+        return Field(*spec)
+    raise ValueError("Invalid field specification: {!r}".format(spec))
+
+
+def parse_schema(schema):
+    # type: (Mapping[str, FieldSpec]) -> list[tuple[str, list[tuple[str, Field]]]]
+    """Group fields of the schema by query.
+
+    Return list of (query, [(name, field), ...]) items. The order of
+    queries is the order in which they first appear in the schema.
+    """
+    groups = {}  # type: dict[str, list[tuple[str, Field]]]
+    order = []  # type: list[str]
+    for name, spec in schema.items():
+        field = make_field(spec)
+        if field.query not in groups:
+            groups[field.query] = []
+            order.append(field.query)
+        groups[field.query].append((name, field))
+    return [(query, groups[query]) for query in order]
+
+
+def extract(selector, schema):
+    # type: (Any, Mapping[str, FieldSpec]) -> dict[str, Any]
+    """Calculate values of all schema fields using the `selector`.
+
+    Every distinct query is evaluated only once. If all fields of the query
+    use only first found node then the query is evaluated in first mode.
+    """
+    result = {}  # type: dict[str, Any]
+    for query, fields in parse_schema(schema):
+        first = not any(field.needs_all_items() for _, field in fields)
+        sel_list = selector.select(query, first=first)
+        for name, field in fields:
+            result[name] = field.apply(sel_list)
+    return result
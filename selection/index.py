@@ -0,0 +1,172 @@
+"""Index of elements of parsed document by id, class and tag.
+
+The index is built with one pass over the tree. It answers simple
+document-wide queries like `//*[@id="x"]`, `//div[contains(@class, "y")]`
+or `//a` without evaluating XPath over the whole tree.
+"""
+# from __future__ import annotations
+
+import re
+from typing import Any
+
+from lxml.etree import Element, _Element
+
+from .cache import LruCache
+
+__all__ = ["DocumentIndex", "parse_query"]
+RE_CLASS_SEPARATOR = re.compile(r"[ \t\r\n]+")
+TAG = r"(\*|[A-Za-z_][\w.-]*)"
+VALUE = r"(?:\"([^\"]*)\"|'([^']*)')"
+RE_QUERIES = (
+    ("tag", re.compile(r"//{}\Z".format(TAG))),
+    ("id", re.compile(r"//{}\[\s*@id\s*=\s*{}\s*\]\Z".format(TAG, VALUE))),
+    (
+        "class-substring",
+        re.compile(
+            r"//{}\[\s*contains\(\s*@class\s*,\s*{}\s*\)\s*\]\Z".format(TAG, VALUE)
+        ),
+    ),
+    (
+        "class",
+        re.compile(
+            r"//{}\[\s*contains\(\s*concat\(\s*' '\s*,"
+            r"\s*normalize-space\(\s*@class\s*\)\s*,\s*' '\s*\)\s*,"
+            r"\s*' ([^ ']+) '\s*\)\s*\]\Z".format(TAG)
+        ),
+    ),
+)
+QUERY_CACHE_SIZE = 1000
+QUERY_CACHE = LruCache(
+    maxsize=QUERY_CACHE_SIZE
+)  # type: LruCache[None | tuple[str, str, str]]
+
+
+def make_query_pattern(query):
+    # type: (str) -> None | tuple[str, str, str]
+    query = query.strip()
+    for kind, regexp in RE_QUERIES:
+        match = regexp.match(query)
+        if match:
+            groups = [x for x in match.groups()[1:] if x is not None]
+            value = groups[0] if groups else ""
+            if kind == "class-substring" and (
+                not value or RE_CLASS_SEPARATOR.search(value)
+            ):
+                # Empty string is found in any element, substring with
+                # spaces could match several class names
+                return None
+            return kind, match.group(1), value
+    return None
+
+
+def parse_query(query):
+    # type: (str) -> None | tuple[str, str, str]
+    """Return (kind, tag, value) tuple if the index could answer the query.
+
+    Kind is one of "tag", "id", "class" (exact class name) and
+    "class-substring" (substring of class attribute). Return None if
+    the query is not recognized.
+    """
+    return QUERY_CACHE.get_or_create(query, lambda: make_query_pattern(query))
+
+
+class DocumentIndex(object):  # noqa: UP004
+    """Elements of the tree grouped by id, class name and tag.
+
+    All lists of elements are in document order. The index is a snapshot:
+    it does not see changes of the tree made after it was built.
+
+    :param root: root element of the tree
+    """
+
+    __slots__ = ("_classes", "_ids", "_positions", "_tags", "elements")
+
+    def __init__(self, root):
+        # type: (_Element) -> None
+        self.elements = []  # type: list[_Element]
+        self._ids = {}  # type: dict[str, list[_Element]]
+        self._classes = {}  # type: dict[str, list[_Element]]
+        self._tags = {}  # type: dict[Any, list[_Element]]
+        self._positions = {}  # type: dict[_Element, int]
+        self._build(root)
+
+    def _build(self, root):
+        # type: (_Element) -> None
+        elements = self.elements
+        ids = self._ids
+        classes = self._classes
+        tags = self._tags
+        split_classes = RE_CLASS_SEPARATOR.split
+        for elem in root.getroottree().getroot().iter(Element):
+            self._positions[elem] = len(elements)
+            elements.append(elem)
+            tags.setdefault(elem.tag, []).append(elem)
+            attrib = elem.attrib
+            id_value = attrib.get("id")
+            if id_value is not None:
+                ids.setdefault(id_value, []).append(elem)
+            class_value = attrib.get("class")
+            if class_value:
+                for name in set(split_classes(class_value)):
+                    if name:
+                        classes.setdefault(name, []).append(elem)
+
+    def by_id(self, value):
+        # type: (str) -> None | _Element
+        """Return first element with given id or None."""
+        found = self._ids.get(value)
+        return found[0] if found else None
+
+    def by_class(self, name):
+        # type: (str) -> list[_Element]
+        """Return elements which class attribute includes the class name."""
+        return list(self._classes.get(name, ()))
+
+    def by_tag(self, tag):
+        # type: (str) -> list[_Element]
+        """Return elements with given tag, "*" means all elements."""
+        return list(self.elements if tag == "*" else self._tags.get(tag, ()))
+
+    def by_class_substring(self, value):
+        # type: (str) -> list[_Element]
+        """Return elements which class attribute contains the substring."""
+        groups = [elems for name, elems in self._classes.items() if value in name]
+        if len(groups) == 1:
+            return list(groups[0])
+        found = {elem for elems in groups for elem in elems}
+        return sorted(found, key=self._positions.__getitem__)
+
+    def lookup(self, query):
+        # type: (str) -> None | list[_Element]
+        """Return elements found by XPath query or None if it is not supported.
+
+        Supported queries are `//tag`, `//tag[@id="x"]`,
+        `//tag[contains(@class, "y")]` and the exact class name test
+        `//tag[contains(concat(' ', normalize-space(@class), ' '), ' y ')]`
+        where tag could be "*".
+        """
+        pattern = parse_query(query)
+        if pattern is None:
+            return None
+        kind, tag, value = pattern
+        if kind == "tag":
+            return self.by_tag(tag)
+        found = []  # type: list[_Element]
+        if kind == "id":
+            found = list(self._ids.get(value, ()))
+        elif kind == "class":
+            found = self.by_class(value)
+        else:
+            found = self.by_class_substring(value)
+        if tag != "*":
+            found = [x for x in found if x.tag == tag]
+        return found
+
+    def stats(self):
+        # type: () -> dict[str, Any]
+        return {
+            "elements": len(self.elements),
+            "ids": len(self._ids),
+            "classes": len(self._classes),
+            "tags": len(self._tags),
+        }
@@ -0,0 +1,128 @@
+# from __future__ import annotations
+
+import threading
+import uuid
+from typing import Any, Callable, List, Mapping, cast
+
+from lxml.etree import XPathEvalError
+
+from .backend_lxml import XpathSelector, make_first_xpath, make_xpath
+from .base import Selector
+from .cache import LruCache
+from .extract import Field, FieldSpec, make_field, parse_schema
+
+__all__ = ["ExtractionPlan", "compile_plan"]
+PLAN_CACHE_SIZE = 16
+PLAN_CACHE = LruCache(maxsize=PLAN_CACHE_SIZE)  # type: LruCache[ExtractionPlan]
+
+
+class PlanStep(object):  # noqa: UP004
+    """Evaluation of one query and calculation of fields which use it."""
+
+    __slots__ = ("accessors", "first", "full_xpath", "xpath")
+
+    def __init__(self, query, fields):
+        # type: (str, list[tuple[str, Field]]) -> None
+        self.first = not any(field.needs_all_items() for _, field in fields)
+        self.full_xpath = make_xpath(query)
+        self.xpath = make_first_xpath(query) if self.first else self.full_xpath
+        self.accessors = [
+            (name, field.make_accessor()) for name, field in fields
+        ]  # type: list[tuple[str, Callable[[Any], Any]]]
+
+    def run(self, selector, result):
+        # type: (XpathSelector[Any], dict[str, Any]) -> None
+        try:
+            sel_list = selector.select_xpath(self.xpath, first=self.first)
+        except XPathEvalError:
+            # First-node version of query does not work if the query
+            # returns not a node-set
+            sel_list = selector.select_xpath(self.full_xpath, first=True)
+        for name, accessor in self.accessors:
+            result[name] = accessor(sel_list)
+
+
+class ExtractionPlan(object):  # noqa: UP004
+    """Precompiled schema which could be applied to many documents.
+
+    All XPath queries, regular expressions and accessor methods are
+    resolved when plan is used first time in a thread. Each thread gets its
+    own XPath objects: lxml evaluates XPath object under its internal lock,
+    so sharing them would serialize the threads.
+
+    The plan is picklable: only the schema and the unique token of the plan
+    are pickled. Unpickled plans are cached by token in each process, so
+    the plan sent to a worker process many times is compiled there once.
+
+    Queries of the plan are XPath queries, so `selector_class` must be
+    `XpathSelector` or its subclass.
+    """
+
+    def __init__(self, schema, selector_class=XpathSelector, token=None):
+        # type: (Mapping[str, FieldSpec], type[XpathSelector[Any]], None | str) -> None
+        if not (
+            isinstance(selector_class, type)
+            and issubclass(selector_class, XpathSelector)
+        ):
+            raise TypeError(
+                "Extraction plan requires XpathSelector subclass, got {!r}".format(
+                    selector_class
+                )
+            )
+        self.schema = {name: make_field(spec) for name, spec in schema.items()}
+        self.selector_class = selector_class
+        self.token = uuid.uuid4().hex if token is None else token
+        self._local = threading.local()
+        # Compile plan right now to fail early on invalid queries
+        self._local.steps = self.compile()
+
+    def compile(self):
+        # type: () -> list[PlanStep]
+        return [PlanStep(query, fields) for query, fields in parse_schema(self.schema)]
+
+    @property
+    def steps(self):
+        # type: () -> list[PlanStep]
+        try:
+            # pylint: disable=deprecated-typing-alias
+            return cast(List[PlanStep], self._local.steps)
+        except AttributeError:
+            steps = self.compile()
+            self._local.steps = steps
+            return steps
+
+    def __reduce__(self):
+        # type: () -> tuple[Any, ...]
+        return load_plan, (self.token, self.schema, self.selector_class)
+
+    def apply(self, target):
+        # type: (Any) -> dict[str, Any]
+        """Extract values of all schema fields.
+
+        The `target` could be a selector or lxml node. Node of selector
+        which is not `XpathSelector` is wrapped into `selector_class`.
+        """
+        if not isinstance(target, Selector):
+            target = self.selector_class(target)
+        elif not isinstance(target, XpathSelector):
+            # pylint: disable-next=protected-access
+            target = self.selector_class(target.node())._bind(  # noqa: SLF001
+                target.document()
+            )
+        result = {}  # type: dict[str, Any]
+        for step in self.steps:
+            step.run(target, result)
+        return result
+
+
+def load_plan(token, schema, selector_class):
+    # type: (str, Mapping[str, Field], type[XpathSelector[Any]]) -> ExtractionPlan
+    """Return plan with given token unpickled earlier or build it."""
+    return PLAN_CACHE.get_or_create(
+        token, lambda: ExtractionPlan(schema, selector_class, token=token)
+    )
+
+
+def compile_plan(schema, selector_class=XpathSelector):
+    # type: (Mapping[str, FieldSpec], type[XpathSelector[Any]]) -> ExtractionPlan
+    return ExtractionPlan(schema, selector_class=selector_class)
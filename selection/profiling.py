@@ -0,0 +1,279 @@
+"""Opt-in collection of timings of queries and selector list methods.
+
+Profiling is disabled by default and then instrumented methods run without
+any wrapper: the wrappers which record timings are installed into classes
+only while profiling is enabled. Use `enable_profiling()` or `Profiler`
+as a context manager to collect statistics::
+
+    with Profiler() as profiler:
+        run_extraction()
+    print(profiler.stats())
+
+Statistics are grouped by kind of operation ("select", "select_all",
+"select_xpath" or name of `SelectorList` method like "text") and then by
+query. Hooks added with `Profiler.add_hook` are called after each
+operation, use them to send metrics to external monitoring systems.
+"""
+# from __future__ import annotations
+
+import functools
+import threading
+import time
+from collections import deque
+from types import TracebackType  # pylint: disable=unused-import
+from typing import Any, Callable, Deque, TypeVar, cast
+
+__all__ = [
+    "Profiler",
+    "disable_profiling",
+    "enable_profiling",
+    "get_profiler",
+    "register_cache",
+]
+# pylint: disable-next=deprecated-typing-alias
+FuncT = TypeVar("FuncT", bound=Callable[..., Any])
+ClassT = TypeVar("ClassT")
+# pylint: disable-next=deprecated-typing-alias
+Hook = Callable[[str, str, float, "int | None"], None]
+PROFILER = None  # type: None | Profiler
+CACHES = {}  # type: dict[str, Callable[[], Any]]
+# (class, name of method, original method, instrumented method)
+INSTRUMENTED = []  # type: list[tuple[type[Any], str, Any, Any]]
+MAX_SAMPLES = 1000
+PERCENTILES = (50, 90, 99)
+timer = getattr(time, "perf_counter", time.time)
+
+
+def register_cache(name, getter):
+    # type: (str, Callable[[], Any]) -> None
+    """Include stats of the cache returned by `getter` into profiler stats."""
+    CACHES[name] = getter
+
+
+class QueryStats(object):  # noqa: UP004
+    """Timings and result sizes of one query.
+
+    Only last `max_samples` timings are used to calculate percentiles.
+    """
+
+    __slots__ = (
+        "calls",
+        "max_time",
+        "min_time",
+        "samples",
+        "sized_calls",
+        "total_size",
+        "total_time",
+    )
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        # type: (int) -> None
+        self.calls = 0
+        self.total_time = 0.0
+        self.min_time = None  # type: None | float
+        self.max_time = None  # type: None | float
+        self.sized_calls = 0
+        self.total_size = 0
+        self.samples = deque(maxlen=max_samples)  # type: Deque[float]
+
+    def add(self, duration, size=None):
+        # type: (float, None | int) -> None
+        self.calls += 1
+        self.total_time += duration
+        if self.min_time is None or duration < self.min_time:
+            self.min_time = duration
+        if self.max_time is None or duration > self.max_time:
+            self.max_time = duration
+        if size is not None:
+            self.sized_calls += 1
+            self.total_size += size
+        self.samples.append(duration)
+
+    def as_dict(self):
+        # type: () -> dict[str, Any]
+        samples = sorted(self.samples)
+        result = {
+            "calls": self.calls,
+            "total_time": self.total_time,
+            "mean_time": self.total_time / self.calls if self.calls else None,
+            "min_time": self.min_time,
+            "max_time": self.max_time,
+            "total_size": self.total_size,
+            "mean_size": (
+                float(self.total_size) / self.sized_calls if self.sized_calls else None
+            ),
+        }  # type: dict[str, Any]
+        for pct in PERCENTILES:
+            result["p{}".format(pct)] = percentile(samples, pct)
+        return result
+
+
+def percentile(samples, pct):
+    # type: (list[float], int) -> None | float
+    """Return nearest-rank percentile of sorted samples."""
+    if not samples:
+        return None
+    # Ceil of len * pct / 100 without float rounding errors
+    rank = -(-len(samples) * pct // 100)
+    return samples[max(rank, 1) - 1]
+
+
+class Profiler(object):  # noqa: UP004
+    """Collector of query statistics.
+
+    :param max_samples: number of last timings of each query used
+        to calculate percentiles
+    :param hooks: functions called after each operation with arguments
+        (kind, query, duration in seconds, size of result or None)
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES, hooks=None):
+        # type: (int, None | list[Hook]) -> None
+        self.max_samples = max_samples
+        self.hooks = list(hooks or [])  # type: list[Hook]
+        self._queries = {}  # type: dict[tuple[str, str], QueryStats]
+        self._lock = threading.Lock()
+        self._previous = None  # type: None | Profiler
+
+    def __enter__(self):
+        # type: () -> Profiler
+        self._previous = PROFILER
+        enable_profiling(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # type: (type[Exception], Exception, TracebackType) -> None
+        global PROFILER  # noqa: PLW0603 pylint: disable=global-statement
+        PROFILER = self._previous
+        self._previous = None
+        switch_methods(PROFILER is not None)
+
+    def add_hook(self, hook):
+        # type: (Hook) -> None
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        # type: (Hook) -> None
+        self.hooks.remove(hook)
+
+    def record(self, kind, query, duration, size=None):
+        # type: (str, str, float, None | int) -> None
+        key = (kind, query)
+        with self._lock:
+            try:
+                stats = self._queries[key]
+            except KeyError:
+                stats = self._queries[key] = QueryStats(self.max_samples)
+            stats.add(duration, size)
+        for hook in self.hooks:
+            hook(kind, query, duration, size)
+
+    def stats(self):
+        # type: () -> dict[str, Any]
+        """Return statistics of all recorded queries and of caches.
+
+        The result looks like
+        {"queries": {kind: {query: {"calls": ..., ...}}}, "caches": {...}}.
+        """
+        queries = {}  # type: dict[str, dict[str, Any]]
+        with self._lock:
+            for (kind, query), stats in self._queries.items():
+                queries.setdefault(kind, {})[query] = stats.as_dict()
+        return {
+            "queries": queries,
+            "caches": {name: getter().stats() for name, getter in CACHES.items()},
+        }
+
+    def reset(self):
+        # type: () -> None
+        with self._lock:
+            self._queries.clear()
+
+
+def get_profiler():
+    # type: () -> None | Profiler
+    return PROFILER
+
+
+def enable_profiling(profiler=None):
+    # type: (None | Profiler) -> Profiler
+    """Start collecting statistics with `profiler` or new `Profiler`.
+
+    Return the profiler which is active now.
+    """
+    global PROFILER  # noqa: PLW0603 pylint: disable=global-statement
+    PROFILER = Profiler() if profiler is None else profiler
+    switch_methods(enabled=True)
+    return PROFILER
+
+
+def disable_profiling():
+    # type: () -> None | Profiler
+    """Stop collecting statistics and return the profiler which was active."""
+    global PROFILER  # noqa: PLW0603 pylint: disable=global-statement
+    previous = PROFILER
+    PROFILER = None
+    switch_methods(enabled=False)
+    return previous
+
+
+def switch_methods(enabled):
+    # type: (bool) -> None
+    """Install instrumented or original methods into instrumented classes."""
+    for cls, name, func, wrapper in INSTRUMENTED:
+        setattr(cls, name, wrapper if enabled else func)
+
+
+def instrument(kind):
+    # type: (str) -> Callable[[FuncT], FuncT]
+    """Mark `SelectorList` method which calls should be recorded.
+
+    The method itself is returned as is. The class must be decorated with
+    `instrument_class`. The query of the selector list is used as the query
+    of the record.
+    """
+
+    def decorator(func):
+        # type: (FuncT) -> FuncT
+        cast(Any, func).profiling_kind = kind
+        return func
+
+    return decorator
+
+
+def instrument_class(cls):
+    # type: (type[ClassT]) -> type[ClassT]
+    """Prepare instrumented versions of methods marked with `instrument`.
+
+    They replace the original methods while profiling is enabled.
+    """
+    for name, func in list(vars(cls).items()):
+        kind = getattr(func, "profiling_kind", None)
+        if kind is not None:
+            INSTRUMENTED.append((cls, name, func, make_wrapper(kind, func)))
+    switch_methods(PROFILER is not None)
+    return cls
+
+
+def make_wrapper(kind, func):
+    # type: (str, FuncT) -> FuncT
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):  # noqa: ANN002, ANN003
+        # type: (Any, Any, Any) -> Any
+        profiler = PROFILER
+        if profiler is None:
+            return func(self, *args, **kwargs)
+        started = timer()
+        result = None
+        try:
+            result = func(self, *args, **kwargs)
+            return result
+        finally:
+            profiler.record(
+                kind,
+                self.origin_query,
+                timer() - started,
+                len(result) if isinstance(result, list) else None,
+            )
+
+    return cast(FuncT, wrapper)
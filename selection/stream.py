@@ -0,0 +1,51 @@
+"""Processing of record-oriented documents without building the whole tree."""
+# from __future__ import annotations
+
+from typing import IO, Any, Iterator, Sequence  # pylint: disable=unused-import
+
+import lxml.etree
+import six
+
+from .backend_lxml import LxmlNodeSelector, XpathSelector
+from .util import PARSER_TYPES
+
+__all__ = ["iterparse_selectors"]
+
+
+def iterparse_selectors(
+    source,  # type: str | bytes | IO[Any]
+    tag,  # type: str | Sequence[str]
+    parser="xml",  # type: str
+    selector_class=XpathSelector,  # type: type[LxmlNodeSelector[Any]]
+    **options  # type: Any
+):
+    # type: (...) -> Iterator[LxmlNodeSelector[Any]]
+    """Parse document incrementally and yield selector for each record.
+
+    The record is an element with the tag (or one of tags) from `tag`.
+    When the caller asks for next record, the previous record element is
+    cleared and removed from the tree with all preceding siblings, so memory
+    usage does not depend on the number of records in the document.
+    Do not keep selectors or nodes of record after moving to next record.
+
+    :param source: file name, file object opened in binary mode or bytes
+    :param tag: tag name or list of tag names, use "{namespace}tag" format
+        for tags in namespaces
+    :param parser: "html" or "xml"
+    :param options: options of `lxml.etree.iterparse` e.g. encoding,
+        huge_tree, remove_blank_text, remove_comments
+    """
+    if parser not in PARSER_TYPES:
+        raise ValueError("Invalid parser: {}".format(parser))
+    if isinstance(source, six.binary_type):
+        source = six.BytesIO(source)
+    context = lxml.etree.iterparse(
+        source, events=("end",), tag=tag, html=(parser == "html"), **options
+    )
+    for _, elem in context:
+        yield selector_class(elem)
+        elem.clear()
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
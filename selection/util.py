@@ -6,35 +6,114 @@ drop outdated weblib dependency.
 """
 # from __future__ import annotations
 
+import mmap
+import os
 import re
-from typing import List, cast
+import threading
+from typing import IO, Any, List, cast  # pylint: disable=unused-import
 
 import six
 
 try:  # noqa: SIM105
     # for type checking with mypy
     # mypy runs on modern python version
-    from re import Match
+    from re import Match, Pattern
 except ImportError:
     pass
 
+import lxml.etree
 import lxml.html
 from lxml.etree import _Element
 from six.moves.html_entities import name2codepoint
 
+from . import profiling
+from .cache import LruCache, ThreadLocalCache
 from .errors import SelectionNotFoundError
 
 RE_NUMBER = re.compile(r"\d+")
 RE_NUMBER_WITH_SPACES = re.compile(r"\d[\s\d]*")
 RE_SPACE = re.compile(r"\s+")
-RE_NAMED_ENTITY = re.compile(r"(&[a-z]+;)")
-RE_NUM_ENTITY = re.compile(r"(&#[0-9]+;)")
-RE_HEX_ENTITY = re.compile(r"(&#x[a-f0-9]+;)", re.IGNORECASE)
+RE_START_TAG = re.compile(r"<(?:[^>\"']|\"[^\"]*\"|'[^']*')*>")
+RE_END_TAG = re.compile(r"</[^<>]+>\Z")
+RE_ENTITY = re.compile(
+    r"&(?:#([0-9]+)|#[xX]([0-9a-fA-F]+)|([a-zA-Z][a-zA-Z0-9]*));"
+)
+NAMED_ENTITY_CHARS = {
+    name: six.unichr(code) for name, code in name2codepoint.items()
+}  # type: dict[str, str]
+PARSER_TYPES = ("html", "xml")
+PARSER_STORAGE = threading.local()
+MMAP_CHUNK_SIZE = 1024 * 1024
+SMART_TEXT_QUERY = (
+    './descendant-or-self::*[name() != "script" and '
+    'name() != "style"]/text()[normalize-space()]'
+)
+TEXT_QUERY = ".//text()"
+TEXT_XPATH_CACHE_SIZE = 100
+TEXT_XPATH_CACHE = ThreadLocalCache(
+    maxsize=TEXT_XPATH_CACHE_SIZE
+)  # type: ThreadLocalCache[lxml.etree.XPath]
+REGEXP_CACHE_SIZE = 1000
+REGEXP_CACHE = LruCache(
+    maxsize=REGEXP_CACHE_SIZE
+)  # type: LruCache[Pattern[str]] | ThreadLocalCache[Pattern[str]]
 
 
 def normalize_spaces(val):
     # type: (str) -> str
-    return re.sub(r"\s+", " ", val).strip()
+    """Replace each sequence of space-chars with one space and strip the result.
+
+    Splitting and joining the string is implemented in C and works
+    several times faster than regular expression substitution.
+    """
+    return " ".join(val.split())
+
+
+def get_local_xpath(query):
+    # type: (str) -> lxml.etree.XPath
+    """Return XPath object compiled for current thread.
+
+    lxml evaluates XPath object under its internal lock, so each thread
+    gets its own copy.
+    """
+    return TEXT_XPATH_CACHE.get_or_create(query, lambda: lxml.etree.XPath(query))
+
+
+def get_regexp_cache():
+    # type: () -> LruCache[Pattern[str]] | ThreadLocalCache[Pattern[str]]
+    return REGEXP_CACHE
+
+
+def set_regexp_cache(cache):
+    # type: (LruCache[Pattern[str]] | ThreadLocalCache[Pattern[str]]) -> None
+    """Replace the cache which stores compiled regular expressions.
+
+    Use it to set custom size limit e.g.
+    `set_regexp_cache(LruCache(maxsize=10000))`.
+    """
+    global REGEXP_CACHE  # noqa: PLW0603 pylint: disable=global-statement
+    REGEXP_CACHE = cache
+
+
+profiling.register_cache("regexp", get_regexp_cache)
+profiling.register_cache("text-xpath", lambda: TEXT_XPATH_CACHE)
+
+
+def compile_regexp(regexp, flags=0):
+    # type: (bytes | str | Pattern[str], int) -> Pattern[str]
+    """Return compiled regular expression.
+
+    Compiled expressions are cached by (pattern, flags) key. Bytes pattern
+    is decoded from utf-8. Already compiled expression is returned as is.
+    """
+    if isinstance(regexp, six.binary_type):
+        regexp = regexp.decode("utf-8")
+    if not isinstance(regexp, six.text_type):
+        return regexp
+    pattern = regexp
+    return REGEXP_CACHE.get_or_create(
+        (pattern, flags), lambda: re.compile(pattern, flags)
+    )
 
 
 def drop_spaces(val):
@@ -73,33 +152,18 @@ def find_number(
     raise SelectionNotFoundError("Could not find a number in given text")
 
 
-def process_named_entity(match):
-    # type: (Match[str]) -> str
-    entity = match.group(1)
-    name = entity[1:-1]
-    if name in name2codepoint:
-        return chr(name2codepoint[name])
-    return entity
-
-
-def process_num_entity(match):
+def process_entity(match):
     # type: (Match[str]) -> str
-    entity = match.group(1)
-    num = entity[2:-1]
+    num, hex_num, name = match.groups()
     try:
-        return chr(int(num))
-    except ValueError:
-        return entity
-
-
-def process_hex_entity(match):
-    # type: (Match[str]) -> str
-    entity = match.group(1)
-    code = entity[3:-1]
-    try:
-        return chr(int(code, 16))
-    except ValueError:
-        return entity
+        if num is not None:
+            return six.unichr(int(num))
+        if hex_num is not None:
+            return six.unichr(int(hex_num, 16))
+    except (ValueError, OverflowError):
+        # Code point is out of unicode range
+        return match.group(0)
+    return NAMED_ENTITY_CHARS.get(name, match.group(0))
 
 
 def decode_entities(html):
@@ -109,23 +173,52 @@ def decode_entities(html):
     This functions processes following entities:
      * &XXX;
      * &#XXX;
+     * &#xXXX;
+
+    All entities are replaced in one pass, so the text produced by decoding
+    of one entity is not decoded again e.g. "&#38;lt;" becomes "&lt;".
 
     Example::
 
         >>> print html.decode_entities('&rarr;ABC&nbsp;&#82;&copy;')
-        →ABC R©
+        →ABC R©
     """  # noqa: RUF002
-    html = RE_NUM_ENTITY.sub(process_num_entity, html)
-    html = RE_HEX_ENTITY.sub(process_hex_entity, html)
-    return RE_NAMED_ENTITY.sub(process_named_entity, html)
+    if "&" not in html:
+        return html
+    return RE_ENTITY.sub(process_entity, html)
 
 
 def render_html(node):
     # type: (_Element) -> str
     """Render Element node."""
-    return lxml.html.tostring(
-        cast(lxml.html.HtmlElement, node), encoding="utf-8"
-    ).decode("utf-8")
+    return lxml.html.tostring(cast(lxml.html.HtmlElement, node), encoding="unicode")
+
+
+def render_html_bytes(node, encoding="utf-8"):
+    # type: (_Element, str) -> bytes
+    """Render Element node into bytes in given encoding.
+
+    Chars which could not be encoded are written as numeric entities.
+    """
+    return lxml.html.tostring(cast(lxml.html.HtmlElement, node), encoding=encoding)
+
+
+def render_inner_html(node):
+    # type: (_Element) -> str
+    """Render content of Element node: its text and all child nodes.
+
+    The node is serialized in one lxml call and then its start and end
+    tags are cut off.
+    """
+    html = lxml.html.tostring(
+        cast(lxml.html.HtmlElement, node), encoding="unicode", with_tail=False
+    )
+    start = RE_START_TAG.match(html)
+    end = RE_END_TAG.search(html)
+    if start is None or end is None or end.start() < start.end():
+        # Void element like <br>, comment or processing instruction
+        return ""
+    return html[start.end() : end.start()]
 
 
 def get_node_text(node, smart=False, normalize_space=True):
@@ -143,20 +236,124 @@ def get_node_text(node, smart=False, normalize_space=True):
     elif smart:
         # pylint: disable=deprecated-typing-alias
         value = " ".join(
-            cast(
-                List[str],
-                node.xpath(
-                    './descendant-or-self::*[name() != "script" and '
-                    'name() != "style"]/text()[normalize-space()]'
-                ),
-            )
+            cast(List[str], get_local_xpath(SMART_TEXT_QUERY)(node))
         )
     elif isinstance(node, lxml.html.HtmlElement):
         value = node.text_content()
     else:
         # If DOM tree was built with lxml.etree.fromstring
         # then tree nodes do not have text_content() method
-        value = "".join(map(six.text_type, node.xpath(".//text()")))
+        # pylint: disable=deprecated-typing-alias
+        value = "".join(cast(List[str], get_local_xpath(TEXT_QUERY)(node)))
     if normalize_space:
         return normalize_spaces(value)
     return value
+
+
+def get_parser(parser="html", encoding=None, **options):
+    # type: (str, None | str, Any) -> Any
+    """Return lxml parser configured with given options.
+
+    Parsers are cached per thread because lxml parser must not be used
+    by multiple threads at the same time.
+
+    :param parser: "html" or "xml"
+    :param encoding: encoding of the document, it overrides the encoding
+        declared in the document
+    :param options: options of `lxml.html.HTMLParser` or `lxml.etree.XMLParser`
+        e.g. huge_tree, remove_blank_text, remove_comments
+    """
+    if parser not in PARSER_TYPES:
+        raise ValueError("Invalid parser: {}".format(parser))
+    try:
+        parsers = PARSER_STORAGE.parsers
+    except AttributeError:
+        parsers = PARSER_STORAGE.parsers = {}
+    key = (parser, encoding, tuple(sorted(options.items())))
+    try:
+        return parsers[key]
+    except KeyError:
+        parser_cls = lxml.html.HTMLParser if parser == "html" else lxml.etree.XMLParser
+        obj = parsers[key] = parser_cls(encoding=encoding, **options)
+        return obj
+
+
+def xpath_literal(value):
+    # type: (str) -> str
+    """Return XPath string literal which value is `value`."""
+    if '"' not in value:
+        return '"{}"'.format(value)
+    if "'" not in value:
+        return "'{}'".format(value)
+    return "concat({})".format(
+        ", '\"', ".join('"{}"'.format(x) for x in value.split('"'))
+    )
+
+
+def parse_document(data, parser="html", encoding=None, **options):
+    # type: (bytes | str, str, None | str, Any) -> _Element
+    """Build DOM tree from raw HTML or XML document.
+
+    Bytes are passed to lxml as is, without decoding into string.
+    """
+    parser_obj = get_parser(parser, encoding, **options)
+    if parser == "html":
+        return cast(_Element, lxml.html.fromstring(data, parser=parser_obj))
+    try:
+        return cast(_Element, lxml.etree.fromstring(data, parser=parser_obj))
+    except ValueError:
+        if not isinstance(data, six.text_type):
+            raise
+        # XML string with encoding declaration is not accepted by lxml
+        return cast(
+            _Element,
+            lxml.etree.fromstring(
+                data.encode("utf-8"), parser=get_parser(parser, "utf-8", **options)
+            ),
+        )
+
+
+def parse_file(source, parser="html", encoding=None, **options):
+    # type: (str | IO[Any], str, None | str, Any) -> _Element
+    """Build DOM tree from file name or file object."""
+    parser_obj = get_parser(parser, encoding, **options)
+    parse_func = lxml.html.parse if parser == "html" else lxml.etree.parse
+    return cast(_Element, parse_func(source, parser=parser_obj).getroot())
+
+
+def parse_mmap(
+    path,  # type: str
+    parser="html",  # type: str
+    encoding=None,  # type: None | str
+    chunk_size=MMAP_CHUNK_SIZE,  # type: int
+    **options  # type: Any
+):
+    # type: (...) -> _Element
+    """Build DOM tree from memory-mapped file.
+
+    The file is passed to incremental lxml parser in chunks of `chunk_size`
+    bytes, so the content of the file is never loaded into memory as
+    a whole bytes object.
+    """
+    if chunk_size < 1:
+        raise ValueError("Option chunk_size must be a positive number")
+    parser_obj = get_parser(parser, encoding, **options)
+    with open(path, "rb") as inp:
+        size = os.fstat(inp.fileno()).st_size
+        if not size:
+            # Let lxml raise its usual error about empty document
+            return parse_document(b"", parser, encoding, **options)
+        mapped = mmap.mmap(inp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for pos in range(0, size, chunk_size):
+                parser_obj.feed(mapped[pos : pos + chunk_size])
+        except Exception:
+            # Reset the state of the parser which is reused later
+            try:  # noqa: SIM105 contextlib.suppress is not available in py27
+                parser_obj.close()
+            except lxml.etree.LxmlError:
+                pass
+            raise
+        finally:
+            mapped.close()
+    return cast(_Element, parser_obj.close())
@@ -10,6 +10,7 @@ setup(
         'typing-extensions; python_version <= "2.7"',
     ],
     extras_require={
+        "css": ["cssselect"],
         "pyquery": [
             'pyquery<=1.4.1; python_version < "3.0"',
             'pyquery; python_version >= "3.0"',
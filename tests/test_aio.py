@@ -0,0 +1,171 @@
+# coding: utf-8
+import threading
+import time
+from typing import Any
+from unittest import TestCase, skipIf
+
+from lxml.html import fromstring
+
+from selection import XpathSelector, compile_plan
+from selection.errors import SelectionNotFoundError
+
+try:
+    import asyncio
+
+    from selection.aio import AsyncExtractor, aextract, aparse, aselect
+except ImportError:  # python 2.7
+    asyncio = None  # type: ignore[assignment]
+
+HTML = b"<html><h1>title</h1><ul><li>1</li><li>2</li></ul></html>"
+
+
+@skipIf(asyncio is None, "asyncio is not available")
+class AsyncExtractorTestCase(TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.extractor = AsyncExtractor(max_workers=2)
+
+    def tearDown(self):
+        self.extractor.close()
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def run_async(self, func):
+        # type: (Any) -> Any
+        """Call func inside running event loop and wait for its result."""
+        result = self.loop.create_future()
+
+        def copy_result(future):
+            # type: (Any) -> None
+            if future.exception() is not None:
+                result.set_exception(future.exception())
+            else:
+                result.set_result(future.result())
+
+        self.loop.call_soon(
+            lambda: asyncio.ensure_future(func()).add_done_callback(copy_result)
+        )
+        return self.loop.run_until_complete(result)
+
+    def test_aparse_aselect(self):
+        sel = self.run_async(lambda: self.extractor.aparse(HTML))
+        self.assertTrue(isinstance(sel, XpathSelector))
+        sel_list = self.run_async(lambda: self.extractor.aselect(sel, "//li"))
+        self.assertEqual(["1", "2"], sel_list.text_list())
+
+    def test_aextract(self):
+        plan = compile_plan({"title": "//h1", "items": ("//li", "list")})
+        expected = {"title": "title", "items": ["1", "2"]}
+        self.assertEqual(
+            expected, self.run_async(lambda: self.extractor.aextract(HTML, plan))
+        )
+        self.assertEqual(
+            expected,
+            self.run_async(lambda: self.extractor.aextract(fromstring(HTML), plan)),
+        )
+        self.assertEqual(
+            {"title": "title"},
+            self.run_async(lambda: self.extractor.aextract(HTML, {"title": "//h1"})),
+        )
+
+    def test_error(self):
+        self.assertRaises(
+            SelectionNotFoundError,
+            self.run_async,
+            lambda: self.extractor.aextract(HTML, {"x": "//table"}),
+        )
+
+    def test_module_functions(self):
+        sel = self.run_async(lambda: aparse(HTML, extractor=self.extractor))
+        sel_list = self.run_async(
+            lambda: aselect(sel, "//li", first=True, extractor=self.extractor)
+        )
+        self.assertEqual(1, sel_list.count())
+        self.assertEqual(
+            {"title": "title"},
+            self.run_async(
+                lambda: aextract(HTML, {"title": "//h1"}, extractor=self.extractor)
+            ),
+        )
+
+    def test_in_flight_limit(self):
+        extractor = AsyncExtractor(max_workers=4, max_in_flight=2)
+        lock = threading.Lock()
+        stats = {"running": 0, "max_running": 0}
+
+        def job():
+            # type: () -> None
+            with lock:
+                stats["running"] += 1
+                stats["max_running"] = max(stats["max_running"], stats["running"])
+            time.sleep(0.01)
+            with lock:
+                stats["running"] -= 1
+
+        try:
+            self.run_async(
+                lambda: asyncio.gather(*[extractor.submit(job) for _ in range(8)])
+            )
+        finally:
+            extractor.close()
+        self.assertEqual(2, stats["max_running"])
+        self.assertEqual(0, extractor.in_flight)
+
+    def test_cancel_queued_job(self):
+        extractor = AsyncExtractor(max_workers=1, max_in_flight=1)
+        calls = []
+        release = threading.Event()
+
+        def job(num):
+            # type: (int) -> int
+            release.wait()
+            calls.append(num)
+            return num
+
+        def start():
+            # type: () -> Any
+            first = extractor.submit(job, 1)
+            second = extractor.submit(job, 2)
+            second.cancel()
+            release.set()
+            return first
+
+        try:
+            self.assertEqual(1, self.run_async(start))
+        finally:
+            extractor.close()
+        self.assertEqual([1], calls)
+        self.assertEqual(0, extractor.in_flight)
+
+    def test_closed_loop_releases_slot(self):
+        extractor = AsyncExtractor(max_workers=1, max_in_flight=1)
+        calls = []
+        release = threading.Event()
+
+        def job(num):
+            # type: (int) -> int
+            release.wait()
+            calls.append(num)
+            return num
+
+        # The loop is closed while its first job is running and its
+        # second job is waiting in the queue
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        extractor.submit(job, 1)
+        extractor.submit(job, 2)
+        asyncio.set_event_loop(self.loop)
+        loop.close()
+        release.set()
+        try:
+            self.assertEqual(
+                3,
+                self.loop.run_until_complete(
+                    asyncio.wait_for(extractor.submit(job, 3), 5)
+                ),
+            )
+        finally:
+            extractor.close()
+        self.assertEqual([1, 3], calls)
+        self.assertEqual(0, extractor.in_flight)
@@ -0,0 +1,24 @@
+from unittest import TestCase
+
+from benchmarks.suite import BENCHMARKS, compare_results, run
+
+
+class BenchmarkSuiteTestCase(TestCase):
+    def test_all_benchmarks_run(self):
+        for bench in BENCHMARKS:
+            bench.setup(2)()
+
+    def test_run(self):
+        results = run(2, names=["util/normalize_spaces"], repeat=1, min_time=0)
+        self.assertEqual(["util/normalize_spaces"], list(results))
+        self.assertTrue(results["util/normalize_spaces"] > 0)
+
+    def test_compare_results(self):
+        baseline = {"text/text": 1.0, "select/descendant": 1.0}
+        results = {"text/text": 1.4, "select/descendant": 1.4, "new": 100.0}
+        self.assertEqual(["select/descendant"], compare_results(results, baseline))
+        self.assertEqual([], compare_results(results, baseline, threshold=0.5))
+        self.assertEqual(
+            ["select/descendant", "text/text"],
+            compare_results(results, baseline, threshold=0.1),
+        )
@@ -0,0 +1,148 @@
+# coding: utf-8
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+from unittest import TestCase
+
+from selection import bulk, compile_plan
+from selection.bulk import extract_chunk, extract_many, init_worker
+from selection.util import parse_document
+
+SCHEMA = {
+    "title": "//h1",
+    "num": ("//span", "number"),
+}
+
+
+def make_documents(count):
+    # type: (int) -> list[bytes]
+    return [
+        "<html><h1>doc {0}</h1><span>{0}</span></html>".format(idx).encode("utf-8")
+        for idx in range(count)
+    ]
+
+
+class ExtractManyTestCase(TestCase):
+    def setUp(self):
+        self.plan = compile_plan(SCHEMA)
+        self.docs = make_documents(25)
+        self.expected = [{"title": "doc {}".format(x), "num": x} for x in range(25)]
+
+    def test_process_pool(self):
+        results = list(extract_many(self.docs, self.plan, workers=2, chunksize=3))
+        self.assertEqual(self.expected, results)
+
+    def test_thread_pool(self):
+        results = list(
+            extract_many(self.docs, self.plan, workers=4, chunksize=2, mode="thread")
+        )
+        self.assertEqual(self.expected, results)
+
+    def test_process_pool_unordered(self):
+        results = list(
+            extract_many(
+                self.docs,
+                self.plan,
+                workers=2,
+                chunksize=2,
+                ordered=False,
+                with_index=True,
+            )
+        )
+        self.assertEqual(list(enumerate(self.expected)), sorted(results))
+
+    def test_local_mode(self):
+        results = list(extract_many(self.docs, self.plan, workers=0, chunksize=4))
+        self.assertEqual(self.expected, results)
+
+    def test_with_index(self):
+        results = list(
+            extract_many(self.docs, self.plan, workers=0, chunksize=4, with_index=True)
+        )
+        self.assertEqual(list(enumerate(self.expected)), results)
+
+    def test_custom_executor(self):
+        with ThreadPoolExecutor(3) as pool:
+            results = list(
+                extract_many(self.docs, self.plan, executor=pool, ordered=False)
+            )
+        self.assertEqual(
+            sorted(self.expected, key=lambda x: x["num"]),
+            sorted(results, key=lambda x: x["num"]),
+        )
+
+    def test_backpressure(self):
+        consumed = []
+
+        def gen():
+            # type: () -> Iterator[bytes]
+            for doc in self.docs:
+                consumed.append(doc)
+                yield doc
+
+        with ThreadPoolExecutor(1) as pool:
+            results = extract_many(
+                gen(), self.plan, executor=pool, chunksize=2, max_pending=2
+            )
+            self.assertEqual(self.expected[0], next(results))
+            # first chunk is consumed, two chunks are pending
+            self.assertEqual(6, len(consumed))
+            results.close()
+
+    def test_xml_parser(self):
+        plan = compile_plan({"name": "//item/@name"})
+        docs = [b'<?xml version="1.0"?><feed><item name="a"/></feed>']
+        self.assertEqual(
+            [{"name": "a"}], list(extract_many(docs, plan, workers=0, parser="xml"))
+        )
+
+    def test_invalid_options(self):
+        self.assertRaises(ValueError, extract_many, self.docs, self.plan, parser="x")
+        self.assertRaises(ValueError, extract_many, self.docs, self.plan, chunksize=0)
+        self.assertRaises(ValueError, extract_many, self.docs, self.plan, mode="x")
+        self.assertRaises(ValueError, parse_document, b"<a/>", parser="x")
+
+
+class WorkerPlanTestCase(TestCase):
+    def tearDown(self):
+        # type: () -> None
+        bulk.WORKER_PLAN = None
+
+    def test_init_worker(self):
+        init_worker(compile_plan(SCHEMA))
+        self.assertEqual(
+            [{"title": "doc 0", "num": 0}], extract_chunk(make_documents(1))
+        )
+
+    def test_unpickled_plan_is_compiled_once(self):
+        plan = compile_plan(SCHEMA)
+        data = pickle.dumps(plan)
+        plan2 = pickle.loads(data)  # noqa: S301
+        self.assertTrue(plan2 is not plan)
+        self.assertEqual(plan.token, plan2.token)
+        self.assertTrue(pickle.loads(data) is plan2)  # noqa: S301
+        self.assertTrue(pickle.loads(pickle.dumps(plan2)) is plan2)  # noqa: S301
+        other = pickle.dumps(compile_plan(SCHEMA))
+        self.assertFalse(pickle.loads(other) is plan2)  # noqa: S301
+
+
+class ExtractionPlanThreadsTestCase(TestCase):
+    def test_each_thread_has_own_xpath_objects(self):
+        plan = compile_plan(SCHEMA)
+        xpath_objects = []
+
+        def worker():
+            # type: () -> None
+            xpath_objects.append(plan.steps[0].xpath)
+            xpath_objects.append(plan.steps[0].xpath)
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        xpath_ids = [id(x) for x in xpath_objects]
+        self.assertEqual(6, len(xpath_ids))
+        self.assertEqual(3, len(set(xpath_ids)))
+        self.assertFalse(id(plan.steps[0].xpath) in xpath_ids)
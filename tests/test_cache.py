@@ -0,0 +1,203 @@
+# coding: utf-8
+import re
+import threading
+from unittest import TestCase
+
+from lxml.html import fromstring
+
+from selection import backend_lxml, util
+from selection.backend_lxml import XpathSelector, compile_xpath
+from selection.cache import LruCache, ThreadLocalCache
+from selection.extract import Field
+
+
+class LruCacheTestCase(TestCase):
+    def test_get_set(self):
+        cache = LruCache(maxsize=2)  # type: LruCache[int]
+        cache.set("a", 1)
+        self.assertEqual(1, cache.get("a"))
+        self.assertEqual(None, cache.get("b"))
+        self.assertEqual("DEFAULT", cache.get("b", "DEFAULT"))
+        self.assertEqual(
+            {"hits": 1, "misses": 2, "evictions": 0, "size": 1, "maxsize": 2},
+            cache.stats(),
+        )
+
+    def test_lru_eviction(self):
+        cache = LruCache(maxsize=2)  # type: LruCache[int]
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertTrue("a" in cache)
+        self.assertFalse("b" in cache)
+        self.assertTrue("c" in cache)
+        self.assertEqual(1, cache.evictions)
+
+    def test_zero_maxsize(self):
+        cache = LruCache(maxsize=0)  # type: LruCache[int]
+        self.assertEqual(1, cache.get_or_create("a", lambda: 1))
+        self.assertEqual(0, len(cache))
+
+    def test_unlimited(self):
+        cache = LruCache()  # type: LruCache[int]
+        for idx in range(100):
+            cache.set(idx, idx)
+        self.assertEqual(100, len(cache))
+
+    def test_negative_maxsize(self):
+        self.assertRaises(ValueError, LruCache, -1)
+
+    def test_resize(self):
+        cache = LruCache(maxsize=10)  # type: LruCache[int]
+        for idx in range(10):
+            cache.set(idx, idx)
+        cache.resize(3)
+        self.assertEqual(3, len(cache))
+        self.assertEqual(7, cache.evictions)
+        self.assertEqual([7, 8, 9], [x for x in range(10) if x in cache])
+
+    def test_get_or_create(self):
+        cache = LruCache(maxsize=10)  # type: LruCache[int]
+        calls = []
+        for _ in range(3):
+            cache.get_or_create("a", lambda: calls.append(1) or len(calls))
+        self.assertEqual(1, len(calls))
+        self.assertEqual(2, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_threads(self):
+        cache = LruCache(maxsize=50)  # type: LruCache[int]
+
+        def worker(offset):
+            # type: (int) -> None
+            for idx in range(1000):
+                key = (offset + idx) % 100
+                cache.get_or_create(key, lambda key=key: key)
+
+        threads = [threading.Thread(target=worker, args=(x,)) for x in range(8)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+        self.assertEqual(50, len(cache))
+        self.assertEqual(8000, cache.hits + cache.misses)
+
+
+class ThreadLocalCacheTestCase(TestCase):
+    def test_separate_thread_caches(self):
+        cache = ThreadLocalCache(maxsize=5)  # type: ThreadLocalCache[object]
+        values = []
+        ready = [threading.Event() for _ in range(4)]
+        release = threading.Event()
+
+        def worker(ready_event):
+            # type: (threading.Event) -> None
+            val = cache.get_or_create("key", object)
+            self.assertTrue(val is cache.get_or_create("key", object))
+            values.append(val)
+            ready_event.set()
+            # keep thread and its cache alive until stats are checked
+            release.wait()
+
+        threads = [threading.Thread(target=worker, args=(x,)) for x in ready]
+        for th in threads:
+            th.start()
+        for event in ready:
+            event.wait()
+        stats = cache.stats()
+        release.set()
+        for th in threads:
+            th.join()
+        self.assertEqual(4, len({id(x) for x in values}))
+        self.assertEqual(
+            {
+                "hits": 4,
+                "misses": 4,
+                "evictions": 0,
+                "size": 4,
+                "maxsize": 5,
+                "threads": 4,
+            },
+            stats,
+        )
+
+    def test_resize_and_clear(self):
+        cache = ThreadLocalCache(maxsize=5)  # type: ThreadLocalCache[int]
+        for idx in range(5):
+            cache.set(idx, idx)
+        self.assertEqual(5, len(cache))
+        cache.resize(2)
+        self.assertEqual(2, len(cache))
+        self.assertIn(4, cache)
+        self.assertEqual(4, cache.get(4))
+        cache.clear()
+        self.assertEqual(0, len(cache))
+        self.assertRaises(ValueError, ThreadLocalCache, -1)
+
+    def test_xpath_cache(self):
+        orig_cache = backend_lxml.get_xpath_cache()
+        backend_lxml.set_xpath_cache(ThreadLocalCache(maxsize=10))
+        try:
+            sel = XpathSelector(fromstring("<div><b>1</b></div>"))
+            self.assertEqual("1", sel.select("//b").text())
+            self.assertTrue(compile_xpath("//b") is compile_xpath("//b"))
+        finally:
+            backend_lxml.set_xpath_cache(orig_cache)
+
+
+class XpathCacheTestCase(TestCase):
+    def setUp(self):
+        self.orig_cache = backend_lxml.get_xpath_cache()
+
+    def tearDown(self):
+        backend_lxml.set_xpath_cache(self.orig_cache)
+
+    def test_compile_xpath_is_cached(self):
+        backend_lxml.set_xpath_cache(LruCache(maxsize=10))
+        self.assertTrue(compile_xpath("//a") is compile_xpath("//a"))
+
+    def test_custom_cache_size(self):
+        cache = LruCache(maxsize=2)  # type: LruCache[object]
+        backend_lxml.set_xpath_cache(cache)
+        sel = XpathSelector(fromstring("<div><b>1</b><i>2</i></div>"))
+        for idx in range(10):
+            sel.select("//b[{}]".format(idx + 1)).exists()
+        self.assertEqual(2, len(cache))
+        self.assertEqual(8, cache.stats()["evictions"])
+        self.assertEqual("1", sel.select("//b").text())
+
+
+class RegexpCacheTestCase(TestCase):
+    def setUp(self):
+        self.orig_cache = util.get_regexp_cache()
+        self.cache = LruCache(maxsize=2)  # type: LruCache[re.Pattern[str]]
+        util.set_regexp_cache(self.cache)
+
+    def tearDown(self):
+        util.set_regexp_cache(self.orig_cache)
+
+    def test_compile_regexp(self):
+        rex = util.compile_regexp(r"\d+")
+        self.assertTrue(rex is util.compile_regexp(r"\d+"))
+        self.assertTrue(rex is util.compile_regexp(b"\\d+"))
+        self.assertFalse(rex is util.compile_regexp(r"\d+", re.IGNORECASE))
+        self.assertTrue(rex is util.compile_regexp(rex))
+        self.assertEqual(2, self.cache.stats()["hits"])
+        self.assertEqual(2, self.cache.stats()["misses"])
+
+    def test_bounded(self):
+        for idx in range(10):
+            util.compile_regexp("a{{{}}}".format(idx))
+        self.assertEqual(2, len(self.cache))
+        self.assertEqual(8, self.cache.stats()["evictions"])
+
+    def test_rex_uses_cache(self):
+        sel = XpathSelector(fromstring("<div><b>12</b></div>"))
+        for _ in range(3):
+            self.assertEqual("12", sel.rex(r"(\d+)").text())
+            self.assertEqual("12", sel.select("//b").rex(r"(\d+)").text())
+            field = Field("//b", ("rex", r"(\d+)"))
+            self.assertEqual("12", field.apply(sel.select("//b")))
+        self.assertEqual(1, self.cache.stats()["misses"])
+        self.assertEqual(8, self.cache.stats()["hits"])
@@ -0,0 +1,172 @@
+# coding: utf-8
+from unittest import TestCase
+
+from lxml.html import fromstring
+
+from selection import Document, XpathSelector
+
+HTML = (
+    "<html><head><meta charset='cp1251'></head>"
+    "<body><div id='a'>price: <b>10</b></div><div>price: 20</div></body></html>"
+)
+
+
+class DocumentTestCase(TestCase):
+    def test_from_constructors_create_document(self):
+        sel = XpathSelector.from_string(HTML)
+        doc = sel.document()
+        assert doc is not None
+        self.assertTrue(doc.root is sel.node())
+        self.assertEqual(None, doc.source)
+        self.assertEqual(None, doc.cache_stats())
+        self.assertTrue(sel.select("//div").one().document() is doc)
+        self.assertTrue(
+            sel.select("//div", lazy=True).select("b").one().document() is doc
+        )
+
+    def test_plain_selector_has_no_document(self):
+        sel = XpathSelector(fromstring(HTML))
+        self.assertEqual(None, sel.document())
+        self.assertEqual(None, sel.select("//div").one().document())
+        self.assertEqual("20", sel.select("//div[2]").rex(r"(\d+)").text())
+
+    def test_keep_source(self):
+        sel = XpathSelector.from_string(HTML, keep_source=True)
+        doc = sel.document()
+        assert doc is not None
+        self.assertEqual(HTML, doc.source)
+
+    def test_html_not_cached_by_default(self):
+        sel = XpathSelector.from_string(HTML)
+        div = sel.select("//div").one()
+        self.assertEqual("10", div.rex(r"<b>(\d+)").text())
+        div.node().find("b").text = "30"
+        self.assertEqual("30", div.rex(r"<b>(\d+)").text())
+        self.assertTrue("<b>30</b>" in div.html())
+
+    def test_html_cache(self):
+        sel = XpathSelector.from_string(HTML, html_cache_size=10)
+        doc = sel.document()
+        assert doc is not None
+        div = sel.select("//div").one()
+        self.assertEqual("10", div.rex(r"<b>(\d+)").text())
+        self.assertEqual("10", div.rex(r"<b>(\d+)").text())
+        self.assertEqual(
+            "10", sel.select("//div[@id='a']").one().rex(r"<b>(\d+)").text()
+        )
+        stats = doc.cache_stats()
+        assert stats is not None
+        self.assertEqual(1, stats["misses"])
+        self.assertEqual(2, stats["hits"])
+
+    def test_invalidate(self):
+        sel = XpathSelector.from_string(HTML, html_cache_size=10)
+        doc = sel.document()
+        assert doc is not None
+        div = sel.select("//div").one()
+        self.assertEqual("10", div.rex(r"<b>(\d+)").text())
+        div.node().find("b").text = "30"
+        self.assertEqual("10", div.rex(r"<b>(\d+)").text())
+        doc.invalidate()
+        self.assertEqual("30", div.rex(r"<b>(\d+)").text())
+
+    def test_disabled_cache(self):
+        root = fromstring(HTML)
+        doc = Document(root, html_cache_size=0)  # type: Document[object]
+        sel = XpathSelector(root, doc)
+        self.assertEqual("10", sel.rex(r"<b>(\d+)").text())
+        self.assertEqual(None, doc.cache_stats())
+
+    def test_rex_source(self):
+        data = HTML.replace("price: 20", u"цена: 20").encode("cp1251")
+        sel = XpathSelector.from_bytes(data, keep_source=True)
+        matches = sel.rex(r"<div[^>]*>([^<\d]+)", source=True).items
+        self.assertEqual(["price: ", u"цена: "], [x.group(1) for x in matches])
+        self.assertEqual("cp1251", sel.rex(r"charset='([^']+)", source=True).text())
+        self.assertEqual(
+            "20", sel.select("/html").rex(r"(\d+)</div>", source=True).text()
+        )
+
+    def test_rex_source_not_available(self):
+        self.assertRaises(
+            ValueError, XpathSelector.from_string(HTML).rex, "price", source=True
+        )
+        sel = XpathSelector.from_string(HTML, keep_source=True)
+        div = sel.select("//div").one()
+        self.assertRaises(ValueError, div.rex, "price", source=True)
+        self.assertRaises(
+            ValueError, XpathSelector(fromstring(HTML)).rex, "price", source=True
+        )
+        root = fromstring(HTML)
+        sel = XpathSelector(root, Document(root))  # type: XpathSelector[object]
+        self.assertRaises(ValueError, sel.rex, "price", source=True)
+
+    def test_source_encoding(self):
+        data = u"<html><body>цена</body></html>".encode("cp1251")
+        sel = XpathSelector.from_bytes(data, encoding="cp1251", keep_source=True)
+        self.assertEqual(u"цена", sel.rex(u"(цена)", source=True).text())
+
+
+class MemoTestCase(TestCase):
+    def test_disabled_by_default(self):
+        sel = XpathSelector.from_string(HTML)
+        doc = sel.document()
+        assert doc is not None
+        self.assertEqual(None, doc.memo_stats())
+        self.assertEqual(2, sel.select("//div").count())
+
+    def test_memo(self):
+        sel = XpathSelector.from_string(HTML, memo_size=10)
+        doc = sel.document()
+        assert doc is not None
+        div = sel.select("//div").one()
+        self.assertEqual("10", div.select("b").text())
+        self.assertEqual("10", div.select("b").text())
+        self.assertEqual("10", sel.select("//div").one().select("b").text())
+        self.assertEqual(2, sel.select("//div").count())
+        self.assertEqual(1, sel.select("//div", first=True).count())
+        stats = doc.memo_stats()
+        assert stats is not None
+        self.assertEqual(4, stats["hits"])
+        self.assertEqual(3, stats["misses"])
+        # Results are wrapped into new selectors each time
+        self.assertFalse(
+            sel.select("//div").selector_list is sel.select("//div").selector_list
+        )
+
+    def test_backend_is_part_of_key(self):
+        # pylint: disable-next=import-outside-toplevel
+        from selection.backend_css import CssSelector  # noqa: PLC0415
+
+        root = fromstring(HTML)
+        doc = Document(root, memo_size=10)  # type: Document[object]
+        # Same query means different things in CSS and XPath
+        self.assertEqual(1, CssSelector(root, doc).select("b").count())
+        self.assertEqual(0, XpathSelector(root, doc).select("b").count())
+
+    def test_invalidate(self):
+        sel = XpathSelector.from_string(HTML, memo_size=10)
+        doc = sel.document()
+        assert doc is not None
+        self.assertEqual(2, sel.select("//div").count())
+        node = sel.select("//div").node()
+        node.getparent().remove(node)
+        self.assertEqual(2, sel.select("//div").count())
+        doc.invalidate()
+        self.assertEqual(1, sel.select("//div").count())
+
+    def test_bounds(self):
+        sel = XpathSelector.from_string(HTML)
+        doc = Document(
+            sel.node(), memo_size=2, memo_max_nodes=1
+        )  # type: Document[object]
+        sel = XpathSelector(sel.node(), doc)
+        sel.select("//div")
+        sel.select("//b")
+        sel.select("//body")
+        sel.select("//head")
+        stats = doc.memo_stats()
+        assert stats is not None
+        # Result of //div is too long, //b has been evicted
+        self.assertEqual(2, stats["size"])
+        self.assertEqual(1, stats["evictions"])
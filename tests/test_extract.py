@@ -0,0 +1,194 @@
+# coding: utf-8
+import pickle
+import re
+from typing import Any
+from unittest import TestCase
+
+from lxml.html import fromstring
+
+from selection import ExtractionPlan, Field, XpathSelector, compile_plan
+from selection.errors import SelectionNotFoundError
+from selection.extract import parse_schema
+
+SCHEMA = {
+    "title": "//h1",
+    "price": Field("//div[@class='price']", "number", ignore_spaces=True),
+    "links": ("//li/a", ("attr_list", "href"), None),
+    "first_link": ("//li/a", ("attr", "href")),
+    "names": ("//li/a", "list"),
+    "item_id": ("//div[@id='info']", ("rex", r"ITEM_ID=(\d+)", re.IGNORECASE)),
+    "missing": ("//table", "text", None),
+    "label": ('concat("#", //div[@id="info"]/@id)', "text"),
+}
+HTML = """
+<html>
+    <body>
+        <h1>Product <b>one</b></h1>
+        <div class="price">Price: 1 200 USD</div>
+        <ul>
+            <li><a href="/a">A</a></li>
+            <li><a href="/b">B</a></li>
+            <li><a>C</a></li>
+        </ul>
+        <div id="info">item_id=42</div>
+    </body>
+</html>
+"""
+
+
+class ExtractTestCase(TestCase):
+    def setUp(self):
+        self.sel = XpathSelector(fromstring(HTML))
+
+    def test_extract(self):
+        result = self.sel.extract(
+            {
+                "title": "//h1",
+                "price": ("//div[@class='price']", "number", None),
+                "price_full": Field(
+                    "//div[@class='price']", "number", ignore_spaces=True
+                ),
+                "link": ("//li/a", ("attr", "href")),
+                "links": ("//li/a", ("attr_list", "href"), None),
+                "names": ("//li/a", "list"),
+                "count": ("//li/a", "count"),
+                "has_ul": ("//ul", "exists"),
+                "item_id": ("//div[@id='info']", ("rex", r"item_id=(\d+)")),
+                "missing": ("//table", "text", "DEFAULT"),
+            }
+        )
+        self.assertEqual(
+            {
+                "title": "Product one",
+                "price": 1,
+                "price_full": 1200,
+                "link": "/a",
+                "links": ["/a", "/b", None],
+                "names": ["A", "B", "C"],
+                "count": 3,
+                "has_ul": True,
+                "item_id": "42",
+                "missing": "DEFAULT",
+            },
+            result,
+        )
+
+    def test_same_result_as_select(self):
+        sel = self.sel
+        result = sel.extract(
+            {
+                "html": ("//h1", "html"),
+                "inner_html": ("//h1", "inner_html"),
+                "node": ("//h1", "node"),
+                "nodes": ("//li", "node_list"),
+                "smart": Field("//body", smart=True),
+            }
+        )
+        self.assertEqual(sel.select("//h1").html(), result["html"])
+        self.assertEqual(sel.select("//h1").inner_html(), result["inner_html"])
+        self.assertEqual(sel.select("//h1").node(), result["node"])
+        self.assertEqual(sel.select("//li").node_list(), result["nodes"])
+        self.assertEqual(sel.select("//body").text(smart=True), result["smart"])
+
+    def test_required_field(self):
+        self.assertRaises(
+            SelectionNotFoundError, self.sel.extract, {"missing": "//table"}
+        )
+        self.assertRaises(
+            SelectionNotFoundError,
+            self.sel.extract,
+            {"item_id": ("//div[@id='info']", ("rex", r"zzz=(\d+)"))},
+        )
+
+    def test_rex_default(self):
+        result = self.sel.extract(
+            {"item_id": ("//div[@id='info']", ("rex", r"zzz=(\d+)"), None)}
+        )
+        self.assertEqual({"item_id": None}, result)
+
+    def test_invalid_schema(self):
+        self.assertRaises(ValueError, self.sel.extract, {"foo": ("//a", "zzz")})
+        self.assertRaises(ValueError, self.sel.extract, {"foo": 1})
+        self.assertRaises(ValueError, self.sel.extract, {"foo": ()})
+
+    def test_invalid_accessor_arguments(self):
+        for spec in [
+            ("//a", ("attr",)),
+            ("//a", ("attr", "href", "title")),
+            ("//a", ("attr_list",)),
+            ("//a", ("rex",)),
+            ("//a", ("text", "default")),
+            ("//a", ("count", 1)),
+        ]:
+            self.assertRaises(ValueError, compile_plan, {"foo": spec})
+            self.assertRaises(ValueError, parse_schema, {"foo": spec})
+        compile_plan({"foo": ("//a", ("rex", r"(\d+)", re.IGNORECASE))})
+        compile_plan({"foo": ("//a", ("text_list", True))})
+
+    def test_parse_schema_groups_queries(self):
+        groups = parse_schema(
+            {"a": "//h1", "b": ("//li", "count"), "c": ("//h1", "html")}
+        )
+        self.assertEqual(["//h1", "//li"], [query for query, _ in groups])
+        self.assertEqual(["a", "c"], [name for name, _ in groups[0][1]])
+
+
+class ExtractionPlanTestCase(TestCase):
+    def setUp(self):
+        self.tree = fromstring(HTML)
+        self.expected = {
+            "title": "Product one",
+            "price": 1200,
+            "links": ["/a", "/b", None],
+            "first_link": "/a",
+            "names": ["A", "B", "C"],
+            "item_id": "42",
+            "missing": None,
+            "label": "#info",
+        }
+
+    def test_apply(self):
+        plan = compile_plan(SCHEMA)
+        self.assertTrue(isinstance(plan, ExtractionPlan))
+        self.assertEqual(self.expected, plan.apply(XpathSelector(self.tree)))
+        self.assertEqual(self.expected, plan.apply(self.tree))
+
+    def test_selector_class_must_be_xpath_selector(self):
+        # pylint: disable-next=import-outside-toplevel
+        from selection.backend_css import CssSelector  # noqa: PLC0415
+
+        self.assertRaises(TypeError, compile_plan, SCHEMA, selector_class=CssSelector)
+        self.assertRaises(TypeError, compile_plan, SCHEMA, selector_class=object)
+        plan = compile_plan(SCHEMA)
+        self.assertEqual(self.expected, plan.apply(CssSelector(self.tree)))
+
+    def test_selector_class_with_custom_constructor(self):
+        # pylint: disable-next=import-outside-toplevel
+        from selection.backend_css import CssSelector  # noqa: PLC0415
+
+        class CustomSelector(XpathSelector[Any]):
+            __slots__ = ()
+
+            def __init__(self, node):
+                # type: (Any) -> None
+                super(CustomSelector, self).__init__(node)  # noqa: UP008
+
+        plan = compile_plan(SCHEMA, selector_class=CustomSelector)
+        sel = CssSelector.from_string(HTML)  # type: CssSelector[Any]
+        self.assertEqual(self.expected, plan.apply(sel))
+        self.assertEqual(self.expected, plan.apply(self.tree))
+
+    def test_same_result_as_extract(self):
+        plan = compile_plan(SCHEMA)
+        sel = XpathSelector(self.tree)
+        self.assertEqual(sel.extract(SCHEMA), plan.apply(sel))
+
+    def test_pickle(self):
+        plan = compile_plan(SCHEMA)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            plan2 = pickle.loads(pickle.dumps(plan, protocol))  # noqa: S301
+            self.assertEqual(self.expected, plan2.apply(self.tree))
+
+    def test_required_field(self):
+        plan = compile_plan({"missing": "//table"})
+        self.assertRaises(SelectionNotFoundError, plan.apply, self.tree)
@@ -0,0 +1,112 @@
+# coding: utf-8
+from unittest import TestCase
+
+from lxml.html import fromstring
+
+from selection import Document, XpathSelector
+from selection.index import DocumentIndex, parse_query
+
+HTML = (
+    u"<html><body>"
+    u"<div id='main' class='item first'><a href='/1'>one</a><!-- comment --></div>"
+    u"<div class='item\tlast'><a href='/2'>two</a><p id='main'>dup</p></div>"
+    u"<div class='items'><span class='x\xa0item'>three</span></div>"
+    u"<p class='a b'>four</p><p class=''>five</p>"
+    u"</body></html>"
+)
+QUERIES = [
+    "//a",
+    "//*",
+    "//div",
+    "//DIV",
+    "//*[@id='main']",
+    '//div[@id="main"]',
+    "//p[@id='main']",
+    "//*[@id='none']",
+    "//*[contains(@class, 'item')]",
+    "//div[contains(@class,'item')]",
+    "//span[contains(@class, 'item')]",
+    "//*[contains(@class, 'tem')]",
+    "//*[contains(@class, 'x\xa0item')]",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' item ')]",
+    "//div[contains(concat(' ', normalize-space(@class), ' '), ' last ')]",
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' x\xa0item ')]",
+]
+
+
+class DocumentIndexTestCase(TestCase):
+    def test_lookup_equals_xpath(self):
+        root = fromstring(HTML)
+        index = DocumentIndex(root)
+        for query in QUERIES:
+            self.assertEqual(root.xpath(query), index.lookup(query), query)
+
+    def test_not_supported_queries(self):
+        for query in [
+            "./a",
+            "//div/a",
+            "//a[1]",
+            "//*[contains(@class, '')]",
+            "//*[contains(@class, 'a b')]",
+            "//*[@id='a' or @id='b']",
+        ]:
+            self.assertEqual(None, parse_query(query), query)
+
+    def test_methods(self):
+        root = fromstring(HTML)
+        index = DocumentIndex(root)
+        elem = index.by_id("main")
+        assert elem is not None
+        self.assertEqual("div", elem.tag)
+        self.assertEqual(None, index.by_id("none"))
+        self.assertEqual(2, len(index.by_class("item")))
+        self.assertEqual(["/1", "/2"], [x.get("href") for x in index.by_tag("a")])
+        self.assertEqual(11, index.stats()["elements"])
+
+
+class SelectorIndexTestCase(TestCase):
+    def test_select_uses_index(self):
+        sel = XpathSelector.from_string(HTML, use_index=True)
+        doc = sel.document()
+        assert doc is not None
+        for query in QUERIES:
+            self.assertEqual(
+                sel.node().xpath(query), sel.select(query).node_list(), query
+            )
+        self.assertEqual("dup", sel.select("//p[@id='main']").text())
+        self.assertEqual("one", sel.select("//a", first=True).text())
+        # The index is a snapshot until the document is invalidated
+        link = sel.select("//a").node()
+        link.getparent().remove(link)
+        self.assertEqual(2, sel.select("//a").count())
+        doc.invalidate()
+        self.assertEqual(1, sel.select("//a").count())
+
+    def test_index_is_disabled_by_default(self):
+        sel = XpathSelector.from_string(HTML)
+        self.assertEqual(2, sel.select("//a").count())
+        link = sel.select("//a").node()
+        link.getparent().remove(link)
+        self.assertEqual(1, sel.select("//a").count())
+
+    def test_by_methods(self):
+        for sel in (
+            XpathSelector.from_string(HTML),
+            XpathSelector(fromstring(HTML)),
+        ):
+            div = sel.select("//div[2]").one()
+            self.assertEqual("one", div.by_id("main").text())
+            self.assertEqual(0, div.by_id("none").count())
+            self.assertEqual(["one", "twodup"], div.by_class("item").text_list())
+            self.assertEqual(["four"], sel.by_class("b").text_list())
+            self.assertEqual(["one", "two"], sel.by_tag("a").text_list())
+            self.assertEqual(11, sel.by_tag("*").count())
+        sel = XpathSelector.from_string(HTML)
+        self.assertEqual(0, sel.by_id("it's \"quoted\"").count())
+
+    def test_custom_document(self):
+        root = fromstring(HTML)
+        sel = XpathSelector(
+            root, Document(root, use_index=True)
+        )  # type: XpathSelector[object]
+        self.assertEqual(["one", "two"], sel.select("//a").text_list())
@@ -0,0 +1,134 @@
+from unittest import TestCase
+
+from lxml.etree import XPath
+
+from selection import SelectorList, XpathSelector, compile_plan
+from selection.errors import SelectionNotFoundError
+from selection.profiling import (
+    Profiler,
+    disable_profiling,
+    enable_profiling,
+    get_profiler,
+    percentile,
+)
+
+HTML = "<html><body><div>1</div><div>2</div><a href='/x'>link</a></body></html>"
+
+
+class ProfilingTestCase(TestCase):
+    def tearDown(self):
+        # type: () -> None
+        disable_profiling()
+
+    def test_disabled_by_default(self):
+        self.assertEqual(None, get_profiler())
+        sel = XpathSelector.from_string(HTML)
+        self.assertEqual("1", sel.select("//div").text())
+
+    def test_disabled_path_calls_original_methods(self):
+        original = vars(SelectorList)["exists"]
+        self.assertFalse(hasattr(original, "__wrapped__"))
+        with Profiler():
+            wrapper = vars(SelectorList)["exists"]
+            self.assertTrue(wrapper.__wrapped__ is original)
+        self.assertTrue(vars(SelectorList)["exists"] is original)
+        enable_profiling()
+        self.assertTrue(vars(SelectorList)["exists"] is wrapper)
+        disable_profiling()
+        self.assertTrue(vars(SelectorList)["exists"] is original)
+
+    def test_list_methods_are_recorded_once(self):
+        sel = XpathSelector.from_string(HTML)
+        with Profiler() as profiler:
+            sel.select("//div").text_list()
+            sel.select("//div").attr_list("id", default=None)
+        stats = profiler.stats()["queries"]
+        self.assertEqual(1, stats["text_list"]["//div"]["calls"])
+        self.assertEqual(1, stats["attr_list"]["//div"]["calls"])
+        self.assertFalse("node_list" in stats)
+
+    def test_query_stats(self):
+        sel = XpathSelector.from_string(HTML)
+        with Profiler() as profiler:
+            self.assertEqual("1", sel.select("//div").text())
+            self.assertEqual("/x", sel.select("//a").attr("href"))
+            self.assertEqual(["1", "2"], sel.select("//div").text_list())
+            sel.select("//div", lazy=True)
+        stats = profiler.stats()
+        select = stats["queries"]["select"]["//div"]
+        self.assertEqual(3, select["calls"])
+        self.assertEqual(4, select["total_size"])
+        self.assertEqual(2.0, select["mean_size"])
+        self.assertTrue(select["min_time"] <= select["p50"] <= select["max_time"])
+        self.assertEqual(1, stats["queries"]["text"]["//div"]["calls"])
+        self.assertEqual(1, stats["queries"]["attr"]["//a"]["calls"])
+        self.assertEqual(2, stats["queries"]["text_list"]["//div"]["total_size"])
+        self.assertTrue("xpath" in stats["caches"])
+        self.assertTrue("regexp" in stats["caches"])
+        self.assertTrue("text-xpath" in stats["caches"])
+
+    def test_plan_compiled_before_profiling(self):
+        plan = compile_plan({"first": "//div", "link": ("//a", ("attr", "href"))})
+        sel = XpathSelector.from_string(HTML)
+        with Profiler() as profiler:
+            self.assertEqual({"first": "1", "link": "/x"}, plan.apply(sel))
+        # The plan evaluates first-node versions of the queries
+        stats = profiler.stats()["queries"]
+        self.assertEqual(1, stats["text"]["(//div)[1]"]["calls"])
+        self.assertEqual(1, stats["attr"]["(//a)[1]"]["calls"])
+
+    def test_select_all_and_select_xpath(self):
+        sel = XpathSelector.from_string(HTML)
+        profiler = enable_profiling()
+        self.assertTrue(get_profiler() is profiler)
+        sel.select("//body").select("div", dedupe=True)
+        sel.select_xpath(XPath("//a"))
+        stats = profiler.stats()["queries"]
+        self.assertEqual(2, stats["select_all"]["div"]["total_size"])
+        self.assertEqual(1, stats["select_xpath"]["//a"]["calls"])
+
+    def test_hooks(self):
+        calls = []  # type: list[tuple[str, str, None | int]]
+
+        def hook(kind, query, duration, size):
+            # type: (str, str, float, None | int) -> None
+            self.assertTrue(duration >= 0)
+            calls.append((kind, query, size))
+
+        sel = XpathSelector.from_string(HTML)
+        with Profiler(hooks=[hook]) as profiler:
+            sel.select("//div").exists()
+            profiler.remove_hook(hook)
+            sel.select("//a")
+        self.assertEqual(
+            [("select", "//div", 2), ("exists", "//div", None)],
+            calls,
+        )
+
+    def test_context_manager_restores_previous(self):
+        outer = enable_profiling()
+        with Profiler() as inner:
+            self.assertTrue(get_profiler() is inner)
+        self.assertTrue(get_profiler() is outer)
+        self.assertTrue(disable_profiling() is outer)
+        self.assertEqual(None, get_profiler())
+
+    def test_reset(self):
+        sel = XpathSelector.from_string(HTML)
+        with Profiler() as profiler:
+            sel.select("//div")
+        profiler.reset()
+        self.assertEqual({}, profiler.stats()["queries"])
+
+    def test_error_is_recorded(self):
+        sel = XpathSelector.from_string(HTML)
+        with Profiler() as profiler:
+            self.assertRaises(SelectionNotFoundError, sel.select("//p").text)
+        self.assertEqual(1, profiler.stats()["queries"]["text"]["//p"]["calls"])
+
+    def test_percentile(self):
+        samples = [float(x) for x in range(1, 101)]
+        self.assertEqual(50.0, percentile(samples, 50))
+        self.assertEqual(99.0, percentile(samples, 99))
+        self.assertEqual(1.0, percentile([1.0], 90))
+        self.assertEqual(None, percentile([], 50))
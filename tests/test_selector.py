@@ -1,12 +1,27 @@
 # coding: utf-8
+import os
+import re
+import tempfile
+import threading
+from itertools import islice
+from typing import Any, Iterator
 from unittest import TestCase
 
+try:  # noqa: SIM105
+    from re import Match  # pylint: disable=unused-import
+except ImportError:
+    pass
+
+from cssselect import SelectorError
+from lxml.etree import XMLSyntaxError
 from lxml.html import fromstring
 
+from selection.backend_css import CssSelector, compile_css, css_to_xpath
 from selection.backend_lxml import XpathSelector
 from selection.backend_pyquery import PyquerySelector
-from selection.base import RexResultList
+from selection.base import RexResultList, SelectorList
 from selection.errors import SelectionNotFoundError
+from selection.util import get_parser
 
 HTML = """
 <html>
@@ -42,21 +57,38 @@ class PyqueryTestCase(TestCase):
         self.assertEqual("yet one", sel2.select("li[@class]").text())
 
 
-# class CSSTestCase(TestCase):
-#    def setUp(self):
-#        self.tree = fromstring(HTML)
-#
-#    def test_css_selector(self):
-#        sel = CssSelector(self.tree)
-#        self.assertEqual('one', sel.select('li').text())
-#        self.assertEqual('three', sel.select('li:contains("ree")').text())
-#        self.assertEqual('yet one', sel.select('.li-1').text())
-#
-#    # TODO: That does not work!
-#    def test_nested_selector(self):
-#        sel = CssSelector(self.tree)
-#        sel2 = sel.select('ul')
-#        self.assertEqual('yet one', sel2.select('li[@class]').text())
+class CSSTestCase(TestCase):
+    def setUp(self):
+        self.tree = fromstring(HTML)
+
+    def test_css_selector(self):
+        sel = CssSelector(self.tree)
+        self.assertEqual("one", sel.select("li").text())
+        self.assertEqual("three", sel.select('li:contains("ree")').text())
+        self.assertEqual("yet one", sel.select(".li-1").text())
+        self.assertEqual(
+            ["test", "yet one", "yet two"],
+            sel.select("h1, #second-list > li").text_list(),
+        )
+
+    def test_nested_selector(self):
+        sel = CssSelector(self.tree)
+        sel2 = sel.select("ul")
+        self.assertEqual("yet one", sel2.select("li[class]").text())
+        self.assertEqual("yet two", sel.select("#second-list").select(".li-2").text())
+
+    def test_first_select(self):
+        sel = CssSelector(self.tree)
+        self.assertEqual(["test"], sel.select("li, h1", first=True).text_list())
+        self.assertEqual([], sel.select("table", first=True).text_list())
+
+    def test_translation_is_cached(self):
+        self.assertTrue(compile_css("ul li") is compile_css("ul li"))
+        self.assertEqual("descendant-or-self::ul/li", css_to_xpath("ul > li"))
+
+    def test_invalid_query(self):
+        sel = CssSelector(self.tree)
+        self.assertRaises(SelectorError, sel.select, "li::text")
 
 
 class TestXpathSelector(TestCase):  # pylint: disable=too-many-public-methods
@@ -258,6 +290,25 @@ class TestXpathSelectorList(TestCase):  # pylint: disable=too-many-public-method
             sel.inner_html().strip(),
         )
 
+    def test_inner_html_keeps_text(self):
+        sel = XpathSelector(
+            fromstring(u"<div> caf\xe9 <b title='a&quot;'>x</b> &amp; <i>y</i></div>")
+        ).select("//div")
+        self.assertEqual(
+            u"caf\xe9 <b title='a\"'>x</b> &amp; <i>y</i>", sel.inner_html()
+        )
+        self.assertEqual("", XpathSelector(fromstring("<br>")).inner_html())
+
+    def test_html_bytes(self):
+        sel = XpathSelector(fromstring(u"<p>caf\xe9</p>")).select("//p")
+        self.assertEqual(u"<p>caf\xe9</p>", sel.html())
+        self.assertEqual(b"<p>caf\xc3\xa9</p>", sel.html_bytes())
+        self.assertEqual(b"<p>caf&#233;</p>", sel.html_bytes(encoding="ascii"))
+        self.assertEqual(
+            b"caf\xe9", sel.select("text()").html_bytes(encoding="latin-1")
+        )
+        self.assertEqual("DEFAULT", sel.select("b").html_bytes(default="DEFAULT"))
+
     def test_inner_html_default(self):
         sel = XpathSelector(self.tree).select("//ul/li[10]")
         self.assertRaises(SelectionNotFoundError, sel.inner_html)
@@ -327,6 +378,272 @@ class TestXpathSelectorList(TestCase):  # pylint: disable=too-many-public-method
             SelectionNotFoundError, XpathSelector(self.tree).select("//foo").require
         )
 
+    def test_first_select(self):
+        root = XpathSelector(self.tree)
+        sel = root.select("//ul/li", first=True)
+        self.assertEqual(1, sel.count())
+        self.assertEqual("one", sel.text())
+        self.assertEqual(self.tree.xpath("//ul/li")[0], sel.node())
+        self.assertEqual("li-1", root.select("//ul/li/@class", first=True).text())
+        self.assertEqual(
+            "/index.html",
+            XpathSelector(fromstring('<a href="index.html"></a>'))
+            .select('concat("/",//a/@href)', first=True)
+            .text(),
+        )
+        self.assertFalse(root.select('//ul/li/text()="one"', first=True).exists())
+
+    def test_first_select_not_found(self):
+        sel = XpathSelector(self.tree).select("//ul/li[10]", first=True)
+        self.assertFalse(sel.exists())
+        self.assertEqual("DEFAULT", sel.text(default="DEFAULT"))
+
+    def test_first_select_union(self):
+        sel = XpathSelector(self.tree).select("//li[@class] | //h1", first=True)
+        self.assertEqual("test", sel.text())
+
+    def test_lazy_select(self):
+        sel = XpathSelector(self.tree).select("//ul/li", lazy=True)
+        self.assertEqual("one", sel.text())
+        self.assertTrue(sel.exists())
+        self.assertEqual("three", sel[2].text())
+        self.assertEqual(
+            ["one", "two", "three", "z 4 foo", "yet one", "yet two"], sel.text_list()
+        )
+        self.assertEqual(6, sel.count())
+        self.assertEqual(self.tree.xpath("//ul/li"), sel.node_list())
+
+    def test_lazy_select_empty(self):
+        sel = XpathSelector(self.tree).select("//foo", lazy=True)
+        self.assertFalse(sel.exists())
+        self.assertFalse(sel)
+        self.assertEqual("DEFAULT", sel.text(default="DEFAULT"))
+        self.assertRaises(IndexError, lambda: sel[0])
+        self.assertEqual([], list(sel))
+
+    def test_lazy_list_wraps_on_demand(self):
+        created = []
+
+        def gen():
+            # type: () -> Iterator[XpathSelector[Any]]
+            for node in self.tree.xpath("//ul/li"):
+                created.append(node)
+                yield XpathSelector(node)
+
+        sel = SelectorList(gen(), XpathSelector, "//ul/li")
+        self.assertEqual("one", sel.one().text())
+        self.assertEqual(1, len(created))
+        self.assertTrue(sel.exists())
+        self.assertEqual(1, len(created))
+        self.assertEqual(["one", "two"], [x.text() for x in islice(sel, 2)])
+        self.assertEqual(2, len(created))
+        self.assertEqual(6, len(sel))
+        self.assertEqual(6, len(created))
+        self.assertEqual("yet two", sel[-1].text())
+
+    def test_node_classes(self):
+        sel = XpathSelector(self.tree)
+        item = sel.select("//li[@class]").one()
+        text_item = sel.select("//li/text()").one()
+        self.assertTrue(isinstance(item, XpathSelector))
+        self.assertTrue(isinstance(text_item, XpathSelector))
+        self.assertFalse(item.is_text_node())
+        self.assertTrue(text_item.is_text_node())
+        self.assertTrue(type(item) is type(item.select("self::*").one()))
+        self.assertEqual(XpathSelector, sel.select("//li").origin_selector_class)
+        self.assertEqual("li-1", item.attr("class"))
+        self.assertEqual("DEFAULT", item.attr("id", default="DEFAULT"))
+        self.assertRaises(SelectionNotFoundError, item.attr, "id")
+        self.assertEqual("one", text_item.text())
+        self.assertEqual("one", text_item.html())
+        self.assertRaises(TypeError, text_item.attr, "class")
+        self.assertRaises(TypeError, text_item.select, "a")
+
+    def test_node_class_names(self):
+        sel = XpathSelector(self.tree)
+        item = sel.select("//li[@class]").one()
+        text_item = sel.select("//li/text()").one()
+        self.assertEqual(XpathSelector, type(sel))
+        self.assertNotEqual(XpathSelector, type(item))
+        self.assertEqual("XpathSelector[element]", type(item).__name__)
+        self.assertEqual("XpathSelector[text]", type(text_item).__name__)
+        self.assertEqual(
+            (XpathSelector, type(item), type(text_item)),
+            XpathSelector.node_classes(),
+        )
+
+    def test_construct_node_class_directly(self):
+        sel = XpathSelector(self.tree)
+        item = sel.select("//li[@class]").one()
+        text_item = sel.select("//li/text()").one()
+        other = item.__class__("text")
+        self.assertTrue(type(other) is type(text_item))
+        self.assertTrue(other.is_text_node())
+        self.assertRaises(TypeError, other.attr, "class")
+        other = text_item.__class__(item.node())
+        self.assertTrue(type(other) is type(item))
+        self.assertEqual("li-1", other.attr("class"))
+        self.assertTrue(type(item.__class__(item.node())) is type(item))
+
+    def test_node_classes_keep_custom_constructor(self):
+        created = []
+
+        class CustomSelector(XpathSelector[Any]):
+            __slots__ = ()
+
+            def __init__(self, node):
+                # type: (Any) -> None
+                super(CustomSelector, self).__init__(node)  # noqa: UP008
+                created.append(node)
+
+        sel = CustomSelector.from_string(HTML)
+        item = sel.select("//li[@class]").one()
+        text_item = sel.select("//li/text()").one()
+        self.assertEqual("CustomSelector[element]", type(item).__name__)
+        self.assertEqual("CustomSelector[text]", type(text_item).__name__)
+        self.assertTrue(item.document() is sel.document())
+        self.assertEqual("li-1", item.attr("class"))
+        self.assertRaises(TypeError, text_item.attr, "class")
+        self.assertTrue(type(item.__class__(item.node())) is type(item))
+        self.assertTrue(item.node() in created)
+
+    def test_node_classes_keep_overridden_methods(self):
+        class CustomSelector(XpathSelector[Any]):
+            __slots__ = ()
+
+            def attr(self, key, default=None):  # noqa: ARG002
+                # type: (str, Any) -> Any
+                return "custom"
+
+        item = CustomSelector(self.tree).select("//li").one()
+        self.assertEqual("custom", item.attr("class"))
+        self.assertEqual("one", item.text())
+
+    def test_custom_constructor(self):
+        class CustomSelector(XpathSelector[Any]):
+            __slots__ = ("extra",)
+
+            def __init__(self, node):
+                # type: (Any) -> None
+                super(CustomSelector, self).__init__(node)  # noqa: UP008
+                self.extra = "extra"
+
+        items = CustomSelector(self.tree).select("//li")
+        self.assertEqual("one", items.text())
+        self.assertEqual("extra", items.one().extra)
+        self.assertEqual(None, items.one().document())
+        sel = CustomSelector.from_string(HTML)
+        doc = sel.document()
+        assert doc is not None
+        items = sel.select("//li", lazy=True)
+        self.assertEqual("one", items.text())
+        self.assertTrue(items.one().document() is doc)
+        self.assertEqual("extra", items.one().extra)
+        self.assertEqual(["one"], sel.select("//li/text()").text_list()[:1])
+
+    def test_direct_text_node_selector(self):
+        sel = XpathSelector(" foo  bar ")  # type: XpathSelector[Any]
+        self.assertTrue(sel.is_text_node())
+        self.assertEqual("foo bar", sel.text())
+        self.assertRaises(TypeError, sel.select, "a")
+
+    def test_select_from_list(self):
+        sel = XpathSelector(self.tree).select("//ul")
+        items = sel.select("li")
+        self.assertEqual(6, items.count())
+        self.assertEqual("//ul + li", items.origin_query)
+        self.assertEqual(XpathSelector, items.origin_selector_class)
+
+    def test_select_dedupe(self):
+        sel = XpathSelector(self.tree).select("//ul/li | //ul")
+        self.assertEqual(8, sel.select("ancestor-or-self::ul").count())
+        result = sel.select("ancestor-or-self::ul", dedupe=True)
+        self.assertEqual(self.tree.xpath("//ul"), result.node_list())
+        self.assertEqual("second-list", result[1].attr("id"))
+        self.assertEqual(
+            ["yet one", "yet two"],
+            sel.select("self::ul[@id]/li/text()", dedupe=True).text_list(),
+        )
+
+    def test_select_dedupe_fallback(self):
+        sel = XpathSelector(self.tree)
+        rows = sel.select("//ul")
+        items = sel.select("//li")
+        # Reverse order of nodes to check document order of the result
+        rows = SelectorList(list(reversed(list(rows))), XpathSelector, "//ul")
+        for query in ("li[1] | li[2]", "/html/body/ul/li[1]", "(li)[1]"):
+            result = rows.select(query, dedupe=True)
+            self.assertEqual(
+                [x for x in items.node_list() if x in result.node_list()],
+                result.node_list(),
+            )
+        self.assertEqual(
+            ["one", "yet one"],
+            rows.select("(li)[1]", dedupe=True).text_list(),
+        )
+        self.assertEqual(
+            ["yet one", "one"],
+            rows.select("(li)[1]").text_list(),
+        )
+        self.assertEqual(2, len(rows.select("string(li)", dedupe=True)))
+
+    def test_select_dedupe_text_nodes(self):
+        sel = XpathSelector(self.tree).select("//li/text()")
+        self.assertRaises(TypeError, sel.select, "a", dedupe=True)
+
+    def test_css_select_dedupe(self):
+        sel = CssSelector(self.tree).select("ul, body")
+        self.assertEqual(12, sel.select("li").count())
+        self.assertEqual(
+            ["one", "two", "three", "z 4 foo", "yet one", "yet two"],
+            sel.select("li", dedupe=True).text_list(),
+        )
+        self.assertEqual(
+            ["test", "yet one"], sel.select("h1, .li-1", dedupe=True).text_list()
+        )
+
+    def test_text_list_batch(self):
+        sel = XpathSelector(self.tree).select("//ul/li")
+        self.assertEqual([x.text() for x in sel], sel.text_list())
+        self.assertEqual(
+            [x.text(normalize_space=False) for x in sel],
+            sel.text_list(normalize_space=False),
+        )
+        self.assertEqual(
+            ["one", " two "],
+            XpathSelector(self.tree)
+            .select("//ul/li/text()")
+            .text_list(normalize_space=False)[:2],
+        )
+
+    def test_attr_list_batch(self):
+        sel = XpathSelector(self.tree).select("//ul/li")
+        self.assertRaises(SelectionNotFoundError, sel.attr_list, "class")
+        self.assertEqual(
+            [None, None, None, None, "li-1", "li-2"],
+            sel.attr_list("class", default=None),
+        )
+        self.assertEqual(
+            ["li-1", "li-2"],
+            XpathSelector(self.tree).select("//li[@class]").attr_list("class"),
+        )
+        text_sel = XpathSelector(self.tree).select("//li/text()")
+        self.assertRaises(TypeError, text_sel.attr_list, "class", default=None)
+
+    def test_batch_respects_overridden_methods(self):
+        class UpperSelector(XpathSelector[Any]):
+            __slots__ = ()
+
+            def text(self, smart=False, normalize_space=True):
+                # type: (bool, bool) -> str
+                text = super(UpperSelector, self).text(  # noqa: UP008
+                    smart=smart, normalize_space=normalize_space
+                )
+                return text.upper()
+
+        sel = UpperSelector(self.tree).select("//h1 | //ul[@id]/li")
+        self.assertEqual(["TEST", "YET ONE", "YET TWO"], sel.text_list())
+
 
 class RexResultListTestCase(TestCase):
     def setUp(self):
@@ -354,3 +671,140 @@ class RexResultListTestCase(TestCase):
     def test_number(self):
         sel = XpathSelector(self.tree).select("//ul/li[4]/text()")
         self.assertEqual(4, sel.rex(r"(\d+)").number())
+
+    def test_lazy_matches(self):
+        rex = re.compile(r"(\d+)")
+        consumed = []
+
+        def gen():
+            # type: () -> Iterator[Match[str]]
+            for match in rex.finditer("1 2 3"):
+                consumed.append(match)
+                yield match
+
+        result = RexResultList(gen(), source_rex=rex)
+        self.assertEqual(1, result.number())
+        self.assertEqual("1", result.text())
+        self.assertEqual(1, len(consumed))
+        self.assertEqual("2", result[1].group(1))
+        self.assertEqual(2, len(consumed))
+        self.assertEqual(3, len(result))
+        self.assertEqual(["1", "2", "3"], [x.group(1) for x in result])
+        self.assertEqual("3", result[-1].group(1))
+        self.assertRaises(IndexError, lambda: result[3])
+
+    def test_lazy_rex(self):
+        sel = XpathSelector(self.tree)
+        result = sel.rex(r"<li>(\w+)")
+        self.assertEqual("one", result.text())
+        self.assertEqual(["one", "three"], [x.group(1) for x in result.items])
+        self.assertRaises(SelectionNotFoundError, sel.rex("zzz").one)
+
+    def test_set_items(self):
+        sel = XpathSelector(self.tree)
+        result = sel.rex(r"<li>(\w+)")
+        result.items = iter(sel.rex(r"<h1>(\w+)"))
+        self.assertEqual(["test"], [x.group(1) for x in result])
+        sel_list = sel.select("//li")
+        sel_list.selector_list = iter(sel.select("//h1"))
+        self.assertEqual(["test"], sel_list.text_list())
+
+
+class XpathSelectorConstructorsTestCase(TestCase):
+    def test_from_bytes(self):
+        sel = XpathSelector.from_bytes(HTML.encode("utf-8"))
+        self.assertTrue(isinstance(sel, XpathSelector))
+        self.assertEqual("test", sel.select("//h1").text())
+
+    def test_from_bytes_encoding(self):
+        # fmt: off
+        data = u"<html><body><b>кошка</b></body></html>".encode("cp1251")
+        sel = XpathSelector.from_bytes(data, encoding="cp1251")
+        self.assertEqual(u"кошка", sel.select("//b").text())
+        # fmt: on
+
+    def test_from_bytes_parser_options(self):
+        data = b"<html><body><!-- comment --><b>1</b></body></html>"
+        sel = XpathSelector.from_bytes(data)
+        self.assertTrue(sel.select("//comment()").exists())
+        sel = XpathSelector.from_bytes(data, remove_comments=True)
+        self.assertFalse(sel.select("//comment()").exists())
+
+    def test_from_bytes_xml(self):
+        data = b'<?xml version="1.0" encoding="utf-8"?><feed><Item id="1"/></feed>'
+        sel = XpathSelector.from_bytes(data, parser="xml")
+        self.assertEqual("1", sel.select("//Item").attr("id"))
+        self.assertRaises(ValueError, XpathSelector.from_bytes, data, parser="zzz")
+
+    def test_from_string(self):
+        sel = XpathSelector.from_string(HTML)
+        self.assertEqual("test", sel.select("//h1").text())
+        sel = XpathSelector.from_string(
+            '<?xml version="1.0" encoding="utf-8"?><feed><item>1</item></feed>',
+            parser="xml",
+        )
+        self.assertEqual("1", sel.select("//item").text())
+
+    def test_from_file(self):
+        with tempfile.NamedTemporaryFile(suffix=".html", delete=False) as out:
+            out.write(HTML.encode("utf-8"))
+        try:
+            sel = XpathSelector.from_file(out.name)
+            self.assertEqual("test", sel.select("//h1").text())
+            with open(out.name, "rb") as inp:
+                sel = XpathSelector.from_file(inp)
+            self.assertEqual("test", sel.select("//h1").text())
+        finally:
+            os.unlink(out.name)
+
+    def test_from_mmap(self):
+        items = "".join('<item id="{0}">{0}</item>'.format(x) for x in range(1000))
+        data = '<?xml version="1.0"?><feed>{}</feed>'.format(items).encode("utf-8")
+        with tempfile.NamedTemporaryFile(suffix=".xml", delete=False) as out:
+            out.write(data)
+        try:
+            sel = XpathSelector.from_mmap(out.name, parser="xml", chunk_size=100)
+            self.assertEqual(1000, sel.select("//item").count())
+            self.assertEqual("999", sel.select("//item[last()]").attr("id"))
+            sel = XpathSelector.from_mmap(out.name, chunk_size=7)
+            self.assertEqual(1000, sel.select("//item").count())
+            self.assertRaises(
+                ValueError, XpathSelector.from_mmap, out.name, chunk_size=0
+            )
+        finally:
+            os.unlink(out.name)
+
+    def test_from_mmap_invalid_document(self):
+        with tempfile.NamedTemporaryFile(suffix=".xml", delete=False) as out:
+            out.write(b"<feed><item></feed>")
+        try:
+            self.assertRaises(
+                XMLSyntaxError, XpathSelector.from_mmap, out.name, parser="xml"
+            )
+            # The parser is in good state after the error
+            sel = XpathSelector.from_string("<feed><item/></feed>", parser="xml")
+            self.assertTrue(sel.select("//item").exists())
+        finally:
+            os.unlink(out.name)
+
+    def test_from_mmap_empty_file(self):
+        with tempfile.NamedTemporaryFile(suffix=".xml", delete=False) as out:
+            pass
+        try:
+            self.assertRaises(
+                XMLSyntaxError, XpathSelector.from_mmap, out.name, parser="xml"
+            )
+        finally:
+            os.unlink(out.name)
+
+    def test_parser_reuse(self):
+        parser = get_parser("html", remove_comments=True)
+        self.assertTrue(parser is get_parser("html", remove_comments=True))
+        self.assertFalse(parser is get_parser("html"))
+        other = []
+        thread = threading.Thread(
+            target=lambda: other.append(get_parser("html", remove_comments=True))
+        )
+        thread.start()
+        thread.join()
+        self.assertFalse(parser is other[0])
@@ -0,0 +1,69 @@
+# coding: utf-8
+import os
+import tempfile
+from unittest import TestCase
+
+from selection import XpathSelector
+from selection.stream import iterparse_selectors
+
+
+def make_feed(count):
+    # type: (int) -> bytes
+    items = "".join(
+        '<item id="{0}"><title>Item {0}</title><price>{0}0 USD</price></item>'.format(
+            x
+        )
+        for x in range(count)
+    )
+    return '<?xml version="1.0"?><feed><meta>x</meta>{}</feed>'.format(items).encode(
+        "utf-8"
+    )
+
+
+class IterparseSelectorsTestCase(TestCase):
+    def test_records(self):
+        results = []
+        max_siblings = 0
+        for sel in iterparse_selectors(make_feed(5000), "item"):
+            self.assertTrue(isinstance(sel, XpathSelector))
+            results.append(
+                (
+                    sel.attr("id"),
+                    sel.select("./title").text(),
+                    sel.select("./price").number(),
+                )
+            )
+            parent = sel.node().getparent()
+            max_siblings = max(max_siblings, len(parent))
+        self.assertEqual(5000, len(results))
+        self.assertEqual(("0", "Item 0", 0), results[0])
+        self.assertEqual(("4999", "Item 4999", 49990), results[-1])
+        # Processed records are removed from the tree, only records
+        # parsed ahead of the current one are kept
+        self.assertTrue(max_siblings < 1000)  # noqa: PLR2004
+        self.assertEqual(1, len(parent))
+
+    def test_file_source(self):
+        with tempfile.NamedTemporaryFile(suffix=".xml", delete=False) as out:
+            out.write(make_feed(10))
+        try:
+            ids = [sel.attr("id") for sel in iterparse_selectors(out.name, "item")]
+            self.assertEqual([str(x) for x in range(10)], ids)
+            with open(out.name, "rb") as inp:
+                titles = [
+                    sel.text() for sel in iterparse_selectors(inp, ["title", "meta"])
+                ]
+            self.assertEqual("x", titles[0])
+            self.assertEqual(11, len(titles))
+        finally:
+            os.unlink(out.name)
+
+    def test_html(self):
+        data = b"<html><body><div>1</div><div>2</div></body></html>"
+        self.assertEqual(
+            ["1", "2"],
+            [sel.text() for sel in iterparse_selectors(data, "div", parser="html")],
+        )
+        self.assertRaises(
+            ValueError, lambda: list(iterparse_selectors(data, "div", parser="zzz"))
+        )
@@ -0,0 +1,66 @@
+# coding: utf-8
+import threading
+from unittest import TestCase
+
+from lxml.etree import fromstring as xml_fromstring
+from lxml.html import fromstring
+
+from selection.util import (
+    SMART_TEXT_QUERY,
+    decode_entities,
+    get_local_xpath,
+    get_node_text,
+    normalize_spaces,
+)
+
+
+class NormalizeSpacesTestCase(TestCase):
+    def test_normalize_spaces(self):
+        self.assertEqual("a b c", normalize_spaces("  a \n\t b\r\n\x0bc  "))
+        self.assertEqual("", normalize_spaces(" \n "))
+        self.assertEqual("a b", normalize_spaces(u"a  b"))
+
+
+class DecodeEntitiesTestCase(TestCase):
+    def test_decode_entities(self):
+        self.assertEqual(
+            u"\u2192ABC\xa0R\xa9", decode_entities("&rarr;ABC&nbsp;&#82;&copy;")
+        )
+        self.assertEqual("AB", decode_entities("&#x41;&#X42;"))
+        self.assertEqual(u"\xc6\xb2", decode_entities("&AElig;&sup2;"))
+        self.assertEqual("no entities", decode_entities("no entities"))
+
+    def test_unknown_entities(self):
+        for val in ("&foo;", "&#99999999999999999999;", "&#x110000;", "& amp;"):
+            self.assertEqual(val, decode_entities(val))
+
+    def test_single_pass(self):
+        self.assertEqual("&lt;", decode_entities("&#38;lt;"))
+        self.assertEqual("&amp;", decode_entities("&amp;amp;"))
+
+
+class GetNodeTextTestCase(TestCase):
+    def test_html_node(self):
+        node = fromstring("<div> a <b>b\n</b>c<script>d</script></div>")
+        self.assertEqual("a b\ncd", get_node_text(node, normalize_space=False)[1:])
+        self.assertEqual("a b cd", get_node_text(node))
+        self.assertEqual("a b c", get_node_text(node, smart=True))
+
+    def test_xml_node(self):
+        node = xml_fromstring("<div> a <b>b</b>  c</div>")
+        self.assertEqual(" a b  c", get_node_text(node, normalize_space=False))
+        self.assertEqual("a b c", get_node_text(node))
+
+    def test_local_xpath(self):
+        xpath_obj = get_local_xpath(SMART_TEXT_QUERY)
+        self.assertTrue(xpath_obj is get_local_xpath(SMART_TEXT_QUERY))
+        other = []
+
+        def worker():
+            # type: () -> None
+            other.append(get_local_xpath(SMART_TEXT_QUERY))
+
+        th = threading.Thread(target=worker)
+        th.start()
+        th.join()
+        self.assertFalse(other[0] is xpath_obj)